@@ -0,0 +1,71 @@
+"""Check the time it takes to import the plugin against a budget.
+
+Every run imports commands.py in a fresh interpreter, as Sublime does on
+start and on every plugin reload, and the median is compared to the budget.
+The modules which Sublime's plugin host has loaded already are imported
+before the clock starts, so only the cost of the plugin itself is measured.
+
+    python benchmarks/bench_import.py --budget 30 --runs 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {here!r})
+import harness
+sys.path.insert(0, harness.STUBS)
+import sublime, sublime_plugin
+import importlib, io, os, threading, time, traceback, zipfile
+start = time.perf_counter()
+harness.load_plugin()
+elapsed = (time.perf_counter() - start) * 1000
+typing_loaded = harness.PACKAGE + ".pyisort.typing" in sys.modules
+print(json.dumps({{"ms": elapsed, "typing_loaded": typing_loaded}}))
+"""
+
+
+def measure(runs):
+    samples = []
+    typing_loaded = False
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", SNIPPET.format(here=HERE)]
+        )
+        result = json.loads(output.decode("utf-8"))
+        samples.append(result["ms"])
+        typing_loaded = typing_loaded or result["typing_loaded"]
+
+    return samples, typing_loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=30, help="budget in ms")
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    samples, typing_loaded = measure(args.runs)
+    median = statistics.median(samples)
+    report = {
+        "benchmark": "import",
+        "runs": args.runs,
+        "median_ms": round(median, 3),
+        "min_ms": round(min(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "budget_ms": args.budget,
+        "typing_loaded": typing_loaded,
+        "ok": median <= args.budget and not typing_loaded,
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
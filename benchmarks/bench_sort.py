@@ -0,0 +1,272 @@
+"""Measure settings, interactive, on-save and project sorts of the plugin.
+
+The plugin runs against the stand-in sublime modules and a generated corpus,
+so only an isort binary is needed. Results are printed as JSON, and can be
+saved as a baseline which later runs are compared against.
+
+    python benchmarks/bench_sort.py --isort-bin .venv/bin/isort --output base.json
+    python benchmarks/bench_sort.py --isort-bin .venv/bin/isort --baseline base.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import corpus
+import harness
+
+SCENARIOS = (
+    "load_settings",
+    "get_options",
+    "interactive",
+    "on_save",
+    "project",
+    "runners",
+)
+RUNNERS = ("spawn", "fork_server", "persistent")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(name, samples, units=1, unit="op"):
+    """Turn per-iteration seconds into a report of milliseconds."""
+    total = sum(samples)
+    return {
+        "name": name,
+        "iterations": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "throughput": round(len(samples) * units / total, 3) if total else None,
+        "throughput_unit": "{unit}/s".format(unit=unit),
+    }
+
+
+def peak_rss():
+    """Peak resident set size in KiB of this process and its children."""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    scale = 1024 if sys.platform == "darwin" else 1
+    return {
+        "self_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "children_kib": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+def wait_for(predicate, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise RuntimeError("Timed out waiting for the plugin")
+        time.sleep(0.0002)
+
+
+class Bench:
+    def __init__(self, args, workdir):
+        self.commands = harness.load_plugin()
+        import sublime
+
+        self.args = args
+        self.sublime = sublime
+        self.utils = harness.plugin_module("pyisort.utils")
+        self.cache = harness.plugin_module("pyisort.cache")
+        harness.load_default_settings(
+            isort_bin=args.isort_bin, isort_runner=args.runner, isort_on_save=True
+        )
+        self.commands.plugin_loaded()
+        self.workdir = workdir
+        self.window = sublime.Window(folders=[workdir])
+        self.source = corpus.make_module(args.imports, args.lines)
+        path = os.path.join(workdir, "module.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.source)
+        self.view = self.window.new_view(path, self.source)
+
+    def reset(self):
+        self.view.set_text(self.source)
+        if not self.args.cache:
+            self.cache.result_cache.clear()
+
+    def load_settings(self):
+        samples = []
+        for _ in range(self.args.iterations):
+            self.utils.clear_settings_cache()
+            start = time.perf_counter()
+            self.utils.load_settings(self.view)
+            samples.append(time.perf_counter() - start)
+        return summarize("load_settings", samples)
+
+    def get_options(self):
+        samples = []
+        for _ in range(self.args.iterations):
+            self.utils.clear_settings_cache()
+            start = time.perf_counter()
+            self.utils.get_options(self.view)
+            samples.append(time.perf_counter() - start)
+        return summarize("get_options", samples)
+
+    def interactive(self):
+        samples = []
+        for _ in range(self.args.iterations):
+            self.reset()
+            change_count = self.view.change_count()
+            messages = len(self.sublime.messages)
+            start = time.perf_counter()
+            self.view.run_command("pyisort")
+            wait_for(
+                lambda: self.view.change_count() != change_count
+                or len(self.sublime.messages) != messages
+            )
+            samples.append(time.perf_counter() - start)
+        return summarize("interactive", samples)
+
+    def on_save(self):
+        listener = self.commands.PyisortOnSave()
+        samples = []
+        for _ in range(self.args.iterations):
+            self.reset()
+            start = time.perf_counter()
+            listener.on_pre_save(self.view)
+            samples.append(time.perf_counter() - start)
+        return summarize("on_save", samples)
+
+    def project(self):
+        samples = []
+        root = os.path.join(self.workdir, "project")
+        sorted_cache = harness.plugin_module("pyisort.sorted_cache")
+        for run in range(self.args.project_runs):
+            shutil.rmtree(root, ignore_errors=True)
+            corpus.make_project(
+                root, self.args.files, self.args.imports, self.args.lines, seed=run
+            )
+            if not self.args.cache:
+                sorted_cache._caches.clear()
+                shutil.rmtree(sorted_cache.get_cache_dir(), ignore_errors=True)
+
+            messages = len(self.sublime.messages)
+            start = time.perf_counter()
+            self.window.run_command("pyisort_project", {"paths": [root]})
+            wait_for(
+                lambda: any(
+                    m.startswith("Pyisort: Sorted") or m.startswith("Pyisort: No")
+                    for m in self.sublime.messages[messages:]
+                ),
+                timeout=600,
+            )
+            samples.append(time.perf_counter() - start)
+        return summarize("project", samples, units=self.args.files, unit="file")
+
+    def runners(self):
+        """Run the same isort request through every runner."""
+        head = self.source.encode("utf-8")
+        cmd = [self.args.isort_bin, "-"]
+        results = []
+        for runner in RUNNERS:
+            # Warm up, so a worker start is not counted as a sort.
+            self.utils.isort_cmd(cmd, cwd=self.workdir, input=head, runner=runner)
+            samples = []
+            for _ in range(self.args.iterations):
+                start = time.perf_counter()
+                self.utils.isort_cmd(cmd, cwd=self.workdir, input=head, runner=runner)
+                samples.append(time.perf_counter() - start)
+            results.append(summarize("runner_" + runner, samples))
+
+        spawn = results[0]["p50_ms"]
+        for result in results:
+            result["speedup"] = round(spawn / result["p50_ms"], 2)
+        return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every p50 against the baseline, return regressions."""
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result["name"])
+        if not before or not before["p50_ms"]:
+            continue
+
+        ratio = result["p50_ms"] / before["p50_ms"]
+        result["baseline_p50_ms"] = before["p50_ms"]
+        result["ratio"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(result["name"])
+
+        sys.stderr.write(
+            "{name:<14} {before:>10.3f} ms -> {after:>10.3f} ms  x{ratio:.2f}\n".format(
+                name=result["name"],
+                before=before["p50_ms"],
+                after=result["p50_ms"],
+                ratio=ratio,
+            )
+        )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--isort-bin", default="isort")
+    parser.add_argument("--runner", default="persistent", choices=RUNNERS)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--project-runs", type=int, default=3)
+    parser.add_argument("--imports", type=int, default=30, help="imports per file")
+    parser.add_argument("--lines", type=int, default=500, help="body lines per file")
+    parser.add_argument("--files", type=int, default=50, help="files per project")
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help="comma separated"
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="keep result caches between iterations"
+    )
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with the results in this file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pyisort-corpus-")
+    try:
+        bench = Bench(args, workdir)
+        results = []
+        for name in args.scenarios.split(","):
+            result = getattr(bench, name)()
+            results.extend(result if isinstance(result, list) else [result])
+        bench.commands.plugin_unloaded()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "python": sys.version.split()[0],
+        "runner": args.runner,
+        "corpus": {"imports": args.imports, "lines": args.lines, "files": args.files},
+        "results": results,
+        "peak_rss": peak_rss(),
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
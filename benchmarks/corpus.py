@@ -0,0 +1,63 @@
+"""Generate synthetic python modules and projects with unsorted imports."""
+
+import os
+import random
+
+STDLIB = [
+    "abc", "argparse", "asyncio", "base64", "collections", "contextlib", "copy",
+    "csv", "dataclasses", "datetime", "decimal", "enum", "functools", "glob",
+    "hashlib", "heapq", "io", "itertools", "json", "logging", "math", "os",
+    "pathlib", "pickle", "random", "re", "shutil", "socket", "sqlite3", "string",
+    "struct", "subprocess", "sys", "tempfile", "textwrap", "threading", "time",
+    "typing", "unittest", "urllib", "uuid", "warnings", "weakref", "zipfile",
+]  # fmt: skip
+THIRDPARTY = ["attr", "click", "django", "flask", "numpy", "pandas", "requests"]
+FIRSTPARTY = ["app", "app.models", "app.views", "core", "core.utils"]
+NAMES = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+
+
+def make_import(rng):
+    module = rng.choice(STDLIB + THIRDPARTY + FIRSTPARTY)
+    if rng.random() < 0.5:
+        return "import {module}".format(module=module)
+
+    names = rng.sample(NAMES, rng.randint(1, 4))
+    return "from {module} import {names}".format(module=module, names=", ".join(names))
+
+
+def make_module(imports=30, lines=500, seed=0):
+    """Return the source of a module with shuffled imports and a long body."""
+    rng = random.Random(seed)
+    header = ['"""Generated module {seed}."""'.format(seed=seed)]
+    header.extend(make_import(rng) for _ in range(imports))
+    body = []
+    index = 0
+    while len(body) < lines:
+        body.extend(
+            [
+                "",
+                "",
+                "def function_{index}(value):".format(index=index),
+                "    result = value * {factor}".format(factor=rng.randint(1, 9)),
+                "    if result > {limit}:".format(limit=rng.randint(10, 99)),
+                "        return result - 1",
+                "    return result",
+            ]
+        )
+        index += 1
+
+    return "\n".join(header + body[:lines]) + "\n"
+
+
+def make_project(root, files=50, imports=30, lines=500, seed=0):
+    """Write a project of generated modules in packages of ten and list them."""
+    paths = []
+    for index in range(files):
+        folder = os.path.join(root, "pkg{package}".format(package=index // 10))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, "module{index}.py".format(index=index))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_module(imports, lines, seed + index))
+        paths.append(path)
+
+    return paths
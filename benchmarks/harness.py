@@ -0,0 +1,44 @@
+"""Load the plugin outside of Sublime Text with the stand-in modules."""
+
+import importlib
+import json
+import os
+import re
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+# Sublime imports the plugin as a package named after its folder.
+PACKAGE = "pyisort_bench"
+
+
+def load_plugin():
+    """Import and return the commands module of the plugin."""
+    if STUBS not in sys.path:
+        sys.path.insert(0, STUBS)
+
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [ROOT]
+        sys.modules[PACKAGE] = package
+
+    return importlib.import_module(PACKAGE + ".commands")
+
+
+def plugin_module(name):
+    """Return a module of the plugin, like "pyisort.utils"."""
+    return importlib.import_module(PACKAGE + "." + name)
+
+
+def load_default_settings(**overrides):
+    """Load the shipped package settings into the stand-in sublime module."""
+    import sublime
+
+    with open(os.path.join(ROOT, "pyisort.sublime-settings"), encoding="utf-8") as f:
+        data = json.loads(re.sub(r"^\s*//.*$", "", f.read(), flags=re.M))
+
+    data.update(overrides)
+    constants = plugin_module("pyisort.constants")
+    sublime.load_settings(constants.SETTINGS_FILE_NAME).update(data)
+    return data
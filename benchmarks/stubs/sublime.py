@@ -0,0 +1,301 @@
+"""Stand-in for the parts of the sublime module the plugin touches."""
+
+import tempfile
+import threading
+
+# Sublime applies edits on one thread, the stand-in serializes them instead.
+_edit_lock = threading.RLock()
+_settings = {}
+_cache_path = tempfile.mkdtemp(prefix="pyisort-bench-")
+
+DRAW_NO_FILL = 32
+HIDDEN = 128
+DRAW_NO_OUTLINE = 256
+DRAW_SQUIGGLY_UNDERLINE = 2048
+
+# Every status message, so a benchmark can wait for a background sort.
+messages = []
+message_event = threading.Event()
+
+
+class Region:
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return self.end() - self.begin()
+
+    def empty(self):
+        return self.a == self.b
+
+
+class HistoricPosition:
+    def __init__(self, pt, row, col):
+        self.pt = pt
+        self.row = row
+        self.col = col
+
+
+class TextChange:
+    def __init__(self, a, b, text):
+        self.a = a
+        self.b = b
+        self.str = text
+
+
+class Buffer:
+    def __init__(self, view):
+        self._view = view
+        self._listeners = None
+
+    def id(self):
+        return self._view.id()
+
+    def views(self):
+        return [self._view]
+
+    def primary_view(self):
+        return self._view
+
+
+class Settings:
+    def __init__(self, data=None):
+        self._data = dict(data or {})
+        self._callbacks = {}
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def has(self, key):
+        return key in self._data
+
+    def set(self, key, value):
+        self._data[key] = value
+        for callback in list(self._callbacks.values()):
+            callback()
+
+    def update(self, data):
+        self._data.update(data)
+        for callback in list(self._callbacks.values()):
+            callback()
+
+    def add_on_change(self, tag, callback):
+        self._callbacks[tag] = callback
+
+    def clear_on_change(self, tag):
+        self._callbacks.pop(tag, None)
+
+
+class Window:
+    _next_id = 1
+
+    def __init__(self, folders=None, project_data=None):
+        self._id = Window._next_id
+        Window._next_id += 1
+        self._folders = list(folders or [])
+        self._project_data = project_data
+        self._views = []
+
+    def id(self):
+        return self._id
+
+    def folders(self):
+        return list(self._folders)
+
+    def project_data(self):
+        return self._project_data
+
+    def set_project_data(self, data):
+        self._project_data = data
+
+    def views(self):
+        return list(self._views)
+
+    def active_view(self):
+        return self._views[-1] if self._views else None
+
+    def new_view(self, file_name=None, text=""):
+        view = View(self, file_name, text)
+        self._views.append(view)
+        return view
+
+    def run_command(self, name, args=None):
+        import sublime_plugin
+
+        sublime_plugin.run_window_command(self, name, args or {})
+
+
+class View:
+    _next_id = 1
+
+    def __init__(self, window=None, file_name=None, text="", encoding="UTF-8"):
+        self._id = View._next_id
+        View._next_id += 1
+        self._window = window
+        self._file_name = file_name
+        self._text = text
+        self._encoding = encoding
+        self._change_count = 0
+        self._settings = Settings({"syntax": "Packages/Python/Python.sublime-syntax"})
+        # Sublime keeps a selection of at least one caret, edited in place.
+        self._sel = [Region(0)]
+        self._regions = {}
+        self._status = {}
+        self._last_command = ("", None, 0)
+        self._buffer = Buffer(self)
+
+    def id(self):
+        return self._id
+
+    def buffer_id(self):
+        return self._buffer.id()
+
+    def buffer(self):
+        return self._buffer
+
+    def window(self):
+        return self._window
+
+    def is_valid(self):
+        return True
+
+    def file_name(self):
+        return self._file_name
+
+    def encoding(self):
+        return self._encoding
+
+    def settings(self):
+        return self._settings
+
+    def size(self):
+        return len(self._text)
+
+    def substr(self, region):
+        return self._text[region.begin() : region.end()]
+
+    def sel(self):
+        return self._sel
+
+    def text_point(self, row, col):
+        lines = self._text.splitlines(True)
+        return min(sum(len(line) for line in lines[:row]) + col, len(self._text))
+
+    def line(self, x):
+        if isinstance(x, Region):
+            return Region(self.line(x.begin()).begin(), self.line(x.end()).end())
+
+        end = self._text.find("\n", x)
+        return Region(
+            self._text.rfind("\n", 0, x) + 1, len(self._text) if end < 0 else end
+        )
+
+    def full_line(self, x):
+        region = self.line(x)
+        return Region(region.begin(), min(region.end() + 1, len(self._text)))
+
+    def add_regions(self, key, regions, scope="", icon="", flags=0):
+        self._regions[key] = [Region(r.a, r.b) for r in regions]
+
+    def get_regions(self, key):
+        return list(self._regions.get(key, []))
+
+    def erase_regions(self, key):
+        self._regions.pop(key, None)
+
+    def set_status(self, key, value):
+        self._status[key] = value
+
+    def get_status(self, key):
+        return self._status.get(key, "")
+
+    def erase_status(self, key):
+        self._status.pop(key, None)
+
+    def command_history(self, index, modifying_only=False):
+        """Return the last command run, the only one the plugin asks for."""
+        return self._last_command
+
+    def change_count(self):
+        return self._change_count
+
+    def replace(self, edit, region, text):
+        self._change(region.begin(), region.end(), text)
+
+    def _change(self, begin, end, text):
+        """Edit the text, move the regions and tell the change listeners."""
+        import sublime_plugin
+
+        row = self._text.count("\n", 0, begin)
+        a = HistoricPosition(begin, row, begin - self._text.rfind("\n", 0, begin) - 1)
+        row = self._text.count("\n", 0, end)
+        b = HistoricPosition(end, row, end - self._text.rfind("\n", 0, end) - 1)
+        self._text = self._text[:begin] + text + self._text[end:]
+        self._change_count += 1
+        delta = len(text) - (end - begin)
+        for key, regions in self._regions.items():
+            self._regions[key] = [
+                (
+                    Region(
+                        r.a + delta if r.a >= end else min(r.a, begin + len(text)),
+                        r.b + delta if r.b >= end else min(r.b, begin + len(text)),
+                    )
+                    if r.end() > begin
+                    else r
+                )
+                for r in regions
+            ]
+        # Sublime calls the async listeners later, the stand-in right away.
+        sublime_plugin.notify_text_changed(self._buffer, [TextChange(a, b, text)])
+
+    def insert(self, edit, point, text):
+        self.replace(edit, Region(point), text)
+        return len(text)
+
+    def set_text(self, text):
+        """Replace the whole buffer, as typing would."""
+        with _edit_lock:
+            self._change(0, len(self._text), text)
+            self._last_command = ("insert", {"characters": text}, 1)
+
+    def run_command(self, name, args=None):
+        import sublime_plugin
+
+        with _edit_lock:
+            self._last_command = (name, args, 1)
+            sublime_plugin.run_text_command(self, name, args or {})
+
+
+def load_settings(name):
+    return _settings.setdefault(name, Settings())
+
+
+def status_message(msg):
+    messages.append(msg)
+    message_event.set()
+
+
+def message_dialog(msg):
+    status_message(msg)
+
+
+def set_timeout(fn, delay=0):
+    if delay:
+        threading.Timer(delay / 1000.0, fn).start()
+    else:
+        fn()
+
+
+def set_timeout_async(fn, delay=0):
+    threading.Timer(delay / 1000.0, fn).start()
+
+
+def cache_path():
+    return _cache_path
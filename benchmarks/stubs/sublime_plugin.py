@@ -0,0 +1,75 @@
+"""Stand-in for the sublime_plugin module."""
+
+import re
+
+_text_commands = {}
+_window_commands = {}
+_text_change_listeners = []
+
+
+def _command_name(cls):
+    name = re.sub(r"Command$", "", cls.__name__)
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+class Edit:
+    pass
+
+
+class TextCommand:
+    def __init__(self, view):
+        self.view = view
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _text_commands[_command_name(cls)] = cls
+
+
+class WindowCommand:
+    def __init__(self, window):
+        self.window = window
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _window_commands[_command_name(cls)] = cls
+
+
+class EventListener:
+    pass
+
+
+class TextChangeListener:
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _text_change_listeners.append(cls)
+
+    @classmethod
+    def is_applicable(cls, buffer):
+        return True
+
+    def attach(self, buffer):
+        self.buffer = buffer
+
+    def on_text_changed_async(self, changes):
+        pass
+
+
+def run_text_command(view, name, args):
+    _text_commands[name](view).run(Edit(), **args)
+
+
+def notify_text_changed(buffer, changes):
+    if buffer._listeners is None:
+        buffer._listeners = []
+        for cls in _text_change_listeners:
+            if cls.is_applicable(buffer):
+                listener = cls()
+                listener.attach(buffer)
+                buffer._listeners.append(listener)
+
+    for listener in buffer._listeners:
+        listener.on_text_changed_async(changes)
+
+
+def run_window_command(window, name, args):
+    _window_commands[name](window).run(**args)
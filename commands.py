@@ -1,30 +1,125 @@
-import pathlib
+import os
 
 import sublime
 import sublime_plugin
 
-from .pyisort.logger import get_logger
+from .pyisort.cache import (
+    deferred_saves,
+    lint_results,
+    presort_results,
+    result_cache,
+    sort_edits,
+    sorted_heads,
+    whole_buffer_requests,
+)
+from .pyisort.config import settings_path_args
+from .pyisort.constants import EDITED_KEY, LINT_KEY, MAX_BATCH_FILES
+from .pyisort.diff import changed_lines, compute_hunks
+from .pyisort.imports import (
+    find_import_blocks,
+    find_import_head,
+    has_imports,
+    join_fragments,
+    split_fragments,
+)
+from .pyisort.jobs import lint_jobs, presort_jobs, save_batch, save_jobs
+from .pyisort.logger import configure, get_logger, shutdown_logging
+from .pyisort.process import limits
+from .pyisort.process import stats as process_stats
+from .pyisort.project import ChangedSort, ProjectSort, StagedSort
+from .pyisort.scheduler import INTERACTIVE, get_scheduler, shutdown_scheduler
+from .pyisort.sorted_cache import (
+    DIGEST_SIZE,
+    get_sorted_cache,
+    make_fingerprint,
+    save_sorted_caches,
+)
+from .pyisort.timing import TRIGGER_INTERACTIVE, TRIGGER_LINT, TRIGGER_ON_SAVE, timings
 from .pyisort.utils import (
+    clear_settings_cache,
+    get_config_index,
     get_encoding,
+    get_folder_exclude_patterns,
     get_isort_bin,
+    get_isort_version,
     get_options,
+    get_runner,
     is_python_syntax,
+    isort_cmd,
+    isort_is_warm,
     load_settings,
-    proc_cmd,
+    result_cache_key,
+    unwatch_settings,
+    watch_settings,
 )
+from .pyisort.worker import shutdown_workers
 
 logger = get_logger()
 
 
+def plugin_loaded():
+    # Logging is shut down when the plugin unloads, so a reload restarts it.
+    configure()
+    watch_settings()
+
+
+def plugin_unloaded():
+    unwatch_settings()
+    shutdown_scheduler()
+    shutdown_workers()
+    save_sorted_caches()
+    shutdown_logging()
+
+
+def merge_regions(regions):
+    """Sort regions and merge those which overlap or touch."""
+    merged = []
+    for region in sorted(regions, key=lambda r: (r.begin(), r.end())):
+        if merged and region.begin() <= merged[-1].end():
+            if region.end() > merged[-1].end():
+                merged[-1] = sublime.Region(merged[-1].begin(), region.end())
+        else:
+            merged.append(region)
+
+    return merged
+
+
+def replace_hunks(view, edit, hunks):
+    """Apply sort hunks, which the edited regions listener then passes over."""
+    record = load_settings(view).get("isort_edited_only", False)
+    buffer_id = view.buffer_id()
+    # Replace bottom-up so earlier offsets stay valid.
+    for begin, end, text in reversed(hunks):
+        if record:
+            sort_edits.add(buffer_id, begin, text)
+        view.replace(edit, sublime.Region(begin, end), text)
+
+
+def clear_edited(view, regions=None):
+    """Forget the edits which overlap sorted regions, or all of them."""
+    if regions is None:
+        view.erase_regions(EDITED_KEY)
+        return
+
+    edited = [
+        r
+        for r in view.get_regions(EDITED_KEY)
+        if not any(r.begin() <= s.end() and s.begin() <= r.end() for s in regions)
+    ]
+    view.add_regions(EDITED_KEY, edited, "", "", sublime.HIDDEN)
+
+
 class PyisortCommand(sublime_plugin.TextCommand):
-    def run(self, edit, auto_save=False):
+    def run(self, edit, auto_save=False, pre_save=False, selection=False):
         if not is_python_syntax(self.view):
             err_msg = "Pyisort: The current file syntax is not support"
             logger.error(err_msg)
             sublime.status_message(err_msg)
             return
 
-        isort_bin = get_isort_bin(self.view)
+        with timings.span("settings"):
+            isort_bin = get_isort_bin(self.view)
+            runner = get_runner(self.view)
         if not isort_bin:
             err_msg = "Pyisort: Unable to find isort binary."
             logger.error(err_msg)
@@ -38,39 +133,944 @@ class PyisortCommand(sublime_plugin.TextCommand):
             sublime.status_message(err_msg)
             return
 
-        options = get_options(self.view)
+        with timings.span("options"):
+            options = get_options(self.view)
         if auto_save:
-            # Run isort format on current file in the background.
-            cmd = [isort_bin, filename] + options
-            proc_cmd(cmd)
+            # Run isort format on current file in the background, merging
+            # saves which arrive within the debounce delay.
+            # Let isort apply its skip settings to the explicit path.
+            cmd = [isort_bin, filename, "--filter-files"] + options
+            settings = load_settings(self.view)
+            delay = settings.get("isort_on_save_debounce", 100)
+            batch_size = settings.get("isort_on_save_batch_size", MAX_BATCH_FILES)
+            if batch_size > 1:
+                # Gather files saved together, like by "Save All", into one run.
+                save_batch.add(
+                    filename, (self, cmd, runner), self.sort_saved, delay, batch_size
+                )
+                return
+
+            job = timings.new_job(filename, TRIGGER_ON_SAVE)
+            save_jobs.schedule(
+                filename, lambda: self.sort_file(cmd, filename, runner, job), delay
+            )
         else:
             # Run isort format and replace current file content.
-            encoding = get_encoding(self.view)
+            with timings.span("encoding"):
+                encoding = get_encoding(self.view)
             if not encoding:
                 err_msg = "Pyisort: Unable to detect this file encoding."
                 logger.error(err_msg)
                 sublime.status_message(err_msg)
                 return
 
-            cmd = [isort_bin, "-"] + options
-            cwd = pathlib.Path(filename).parent.absolute().as_posix()
+            cmd, cwd, config, imports_only = self.buffer_request(
+                isort_bin, filename, options
+            )
+            if selection:
+                regions = self.selected_blocks()
+            elif pre_save and load_settings(self.view).get("isort_edited_only", False):
+                regions = self.edited_blocks()
+            else:
+                regions = None
+            if regions is not None:
+                self.sort_blocks(
+                    edit, regions, cmd, cwd, config, encoding, runner, pre_save
+                )
+                return
+
             contents = self.view.substr(sublime.Region(0, self.view.size()))
-            stdout, stderr = proc_cmd(
-                cmd, cwd=cwd, input=contents.encode(encoding)
+            change_count = self.view.change_count()
+            head = self.import_head(contents, imports_only)
+            # Use the speculative sort of this very buffer version if it is done.
+            hunks = presort_results.take(
+                self.view.id(), change_count, (tuple(cmd), encoding, imports_only)
+            )
+            if hunks is None and pre_save and not isort_is_warm(isort_bin, runner):
+                self.defer_save()
+                return
+
+            # The save waits for the sort anyway, other sorts check off the
+            # UI thread, where looking up the isort version may start isort.
+            if (
+                hunks is None
+                and pre_save
+                and self.precheck(
+                    self.head_request(cmd, config, encoding, runner),
+                    head,
+                    encoding,
+                    False,
+                )
+            ):
+                hunks = []
+            if hunks is not None and not hunks and not pre_save:
+                sublime.status_message("Pyisort: Imports are already sorted.")
+                return
+
+            if hunks is not None or pre_save:
+                # The buffer is about to be written, so sort it in place now.
+                trigger = TRIGGER_ON_SAVE if pre_save else TRIGGER_INTERACTIVE
+                with timings.activate(timings.new_job(filename, trigger)):
+                    if hunks is None:
+                        hunks = self.sort_contents(
+                            cmd,
+                            cwd,
+                            config,
+                            head,
+                            encoding,
+                            runner,
+                            contents,
+                            self.pre_save_timeout(),
+                        )
+                    if hunks is None and pre_save:
+                        self.defer_save()
+                        return
+
+                    with timings.span("replace"):
+                        replace_hunks(self.view, edit, hunks or [])
+                return
+
+            get_scheduler().submit(
+                self.sort_async,
+                cmd,
+                cwd,
+                config,
+                head,
+                encoding,
+                runner,
+                contents,
+                change_count,
+                timings.new_job(filename, TRIGGER_INTERACTIVE),
+                priority=INTERACTIVE,
+            )
+
+    def selected_blocks(self):
+        """Return the lines of every selection, or the import block at a cursor."""
+        view = self.view
+        blocks = None
+        regions = []
+        for sel in view.sel():
+            if sel.empty():
+                if blocks is None:
+                    blocks = find_import_blocks(
+                        view.substr(sublime.Region(0, view.size()))
+                    )
+                regions.extend(
+                    sublime.Region(begin, end)
+                    for begin, end in blocks
+                    if begin <= sel.a <= end
+                )
+            else:
+                last = view.full_line(max(sel.begin(), sel.end() - 1))
+                regions.append(
+                    sublime.Region(view.line(sel.begin()).begin(), last.end())
+                )
+
+        return [r for r in merge_regions(regions) if has_imports(view.substr(r))]
+
+    def edited_blocks(self):
+        """Return the import blocks which overlap lines edited since a sort."""
+        view = self.view
+        edited = view.get_regions(EDITED_KEY)
+        if not edited:
+            return []
+
+        regions = []
+        for begin, end in find_import_blocks(
+            view.substr(sublime.Region(0, view.size()))
+        ):
+            if any(r.begin() <= end and begin <= r.end() for r in edited):
+                regions.append(sublime.Region(begin, end))
+
+        return regions
+
+    def sort_blocks(self, edit, regions, cmd, cwd, config, encoding, runner, pre_save):
+        """Sort some regions of the buffer, now before a save or in the background."""
+        filename = self.view.file_name() or ""
+        if not regions:
+            if pre_save:
+                # None of the edits touched an import block.
+                clear_edited(self.view)
+            else:
+                sublime.status_message("Pyisort: No imports to sort.")
+            return
+
+        if not pre_save:
+            get_scheduler().submit(
+                self.sort_regions_async,
+                regions,
+                cmd,
+                cwd,
+                config,
+                encoding,
+                runner,
+                self.view.change_count(),
+                timings.new_job(filename, TRIGGER_INTERACTIVE, regions=len(regions)),
+                priority=INTERACTIVE,
+            )
+            return
+
+        if not isort_is_warm(cmd[0], runner):
+            self.defer_save()
+            return
+
+        job = timings.new_job(filename, TRIGGER_ON_SAVE, regions=len(regions))
+        with timings.activate(job):
+            hunks = self.sort_regions(
+                regions, cmd, cwd, config, encoding, runner, self.pre_save_timeout()
             )
+            if hunks is None:
+                self.defer_save()
+                return
+
+            clear_edited(self.view, regions)
+            with timings.span("replace"):
+                replace_hunks(self.view, edit, hunks)
+
+    def pre_save_timeout(self):
+        """Return the seconds a save may wait for isort."""
+        return load_settings(self.view).get("isort_pre_save_timeout", 1)
+
+    def defer_save(self):
+        """Leave the sort to a sort of the saved file, so the save goes on."""
+        logger.info("Pyisort: Sort %s after the save", self.view.file_name())
+        deferred_saves.add(self.view.id())
+
+    def buffer_request(self, isort_bin, filename, options):
+        """Return the isort command, cwd, config digest and imports only flag."""
+        cwd = os.path.dirname(os.path.abspath(filename)).replace(os.sep, "/")
+        config_path, config = get_config_index(self.view).resolve(cwd)
+        cmd = [isort_bin, "-"] + options + settings_path_args(config_path)
+        # Floating imports to the top also normalizes the end of the file,
+        # so it needs the whole file.
+        imports_only = (
+            load_settings(self.view).get("isort_imports_only", True)
+            and "--float-to-top" not in options
+            and (tuple(cmd), config) not in whole_buffer_requests
+        )
+        return cmd, cwd, config, imports_only
+
+    def import_head(self, contents, imports_only):
+        """Return the part of contents to send to isort."""
+        head_end = find_import_head(contents) if imports_only else None
+        return contents if head_end is None else contents[:head_end]
+
+    def head_request(self, cmd, config, encoding, runner):
+        """Return the request a sorted head is remembered for.
+
+        Besides the command, what isort makes of a head depends on the config
+        digest and the isort version.
+        """
+        return (tuple(cmd), config, get_isort_version(cmd[0], runner), encoding)
+
+    def precheck(self, request, contents, encoding, imports_only):
+        """Tell without isort whether the buffer is known to be sorted.
+
+        It is when it has no imports at all, or when its import head is the
+        one isort returned for the last sort of this view.
+        """
+        if not load_settings(self.view).get("isort_precheck", True):
+            return False
+
+        head = self.import_head(contents, imports_only)
+        if not has_imports(head):
+            return True
+
+        data = head.encode(encoding, "surrogateescape")
+        return sorted_heads.is_sorted(self.view.id(), request, data)
+
+    def presort(self):
+        """Sort the buffer ahead of time and keep the hunks for its version."""
+        view = self.view
+        filename = view.file_name()
+        isort_bin = get_isort_bin(view)
+        if not (view.is_valid() and filename and isort_bin):
+            return
+
+        encoding = get_encoding(view)
+        if not encoding or not is_python_syntax(view):
+            return
+
+        cmd, cwd, config, imports_only = self.buffer_request(
+            isort_bin, filename, get_options(view)
+        )
+        change_count = view.change_count()
+        contents = view.substr(sublime.Region(0, view.size()))
+        head = self.import_head(contents, imports_only)
+        hunks = self.sort_contents(
+            cmd, cwd, config, head, encoding, get_runner(view), contents
+        )
+        if hunks is not None and view.change_count() == change_count:
+            presort_results.put(
+                view.id(), change_count, (tuple(cmd), encoding, imports_only), hunks
+            )
+
+    def sort_file(self, cmd, filename, runner, job=None):
+        with timings.activate(job):
+            self._sort_file(cmd, filename, runner)
+
+    def _sort_file(self, cmd, filename, runner):
+        """Sort a file on disk unless it is known to be sorted already."""
+        cwd = os.path.dirname(filename)
+        options = [arg for arg in cmd[1:] if arg != filename]
+        sorted_cache = get_sorted_cache(
+            make_fingerprint(cmd[0], get_isort_version(cmd[0], runner), options)
+        )
+        config_path, config = get_config_index(self.view).resolve(cwd)
+        if self.precheck_file(cmd, config, runner) or sorted_cache.is_sorted(
+            filename, config[:DIGEST_SIZE]
+        ):
+            timings.annotate(cache_hit=True)
+            logger.debug("Skip sorted file: %s", filename)
+            return
+
+        with open(filename, "rb") as f:
+            data = f.read()
+
+        request = cmd
+        cmd = cmd + settings_path_args(config_path)
+        key = result_cache_key(cmd, config, data, "", runner)
+        cached = result_cache.get(key, data)
+        timings.annotate(
+            bytes_in=len(data), bytes_out=len(data), cache_hit=cached == data
+        )
+        if cached != data:
+            _, stderr = isort_cmd(cmd, runner=runner)
+            if stderr:
+                return
+
+            with open(filename, "rb") as f:
+                output = f.read()
+
+            timings.annotate(bytes_out=len(output))
+            result_cache.put(key, data, output)
+            if output != data:
+                key = result_cache_key(cmd, config, output, "", runner)
+                result_cache.put(key, output, output)
+                data = output
+
+        sorted_cache.mark_sorted([(filename, config[:DIGEST_SIZE])])
+        sorted_cache.schedule_save()
+        self.mark_sorted_file(request, config, runner, data)
+
+    def precheck_file(self, request, config, runner):
+        """Tell without isort whether the saved file is known to be sorted."""
+        view = self.view
+        return view.is_valid() and self.precheck(
+            self.head_request(request, config, "", runner),
+            view.substr(sublime.Region(0, view.size())),
+            "utf-8",
+            "--float-to-top" not in request,
+        )
+
+    def mark_sorted_file(self, request, config, runner, data):
+        """Remember the import head of the sorted file for the view."""
+        # The view holds the same text once it reloads the file.
+        head = self.import_head(
+            data.decode("utf-8", "surrogateescape"), "--float-to-top" not in request
+        )
+        sorted_heads.mark_sorted(
+            self.view.id(),
+            self.head_request(request, config, "", runner),
+            head.encode("utf-8", "surrogateescape"),
+        )
+
+    @staticmethod
+    def sort_saved(batch):
+        """Sort files saved close together with as few isort runs as possible.
+
+        Files share a run when they share the isort binary, options, runner
+        and config. Each view then learns about its own file.
+        """
+        groups = {}
+        for command, cmd, runner in batch:
+            config_path, config = get_config_index(command.view).resolve(
+                os.path.dirname(cmd[1])
+            )
+            key = (cmd[0], tuple(cmd[2:]), runner, config_path)
+            groups.setdefault(key, []).append((command, cmd, config))
+
+        for (isort_bin, options, runner, config_path), entries in groups.items():
+            cwd = os.path.dirname(entries[0][1][1])
+            job = timings.new_job(cwd, TRIGGER_ON_SAVE, files=len(entries))
+            with timings.activate(job):
+                PyisortCommand._sort_saved(
+                    isort_bin, list(options), runner, config_path, cwd, entries
+                )
+
+    @staticmethod
+    def _sort_saved(isort_bin, options, runner, config_path, cwd, entries):
+        import subprocess
+
+        sorted_cache = get_sorted_cache(
+            make_fingerprint(isort_bin, get_isort_version(isort_bin, runner), options)
+        )
+        entries = [
+            e
+            for e in entries
+            if not e[0].precheck_file(e[1], e[2], runner)
+            and not sorted_cache.is_sorted(e[1][1], e[2][:DIGEST_SIZE])
+        ]
+        if not entries:
+            timings.annotate(cache_hit=True)
+            return
+
+        paths = [cmd[1] for _, cmd, _ in entries]
+        cmd = [isort_bin] + paths + options + settings_path_args(config_path)
+        try:
+            stdout, stderr = isort_cmd(
+                cmd, cwd=cwd, runner=runner, timeout=max(limits.timeout, len(paths))
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.error("Pyisort: Unable to sort saved files: %s", e)
+            return
+
+        errors = stderr.decode("utf-8", "replace")
+        done = [e for e in entries if e[1][1] not in errors]
+        sorted_cache.mark_sorted(
+            (cmd[1], config[:DIGEST_SIZE]) for _, cmd, config in done
+        )
+        sorted_cache.schedule_save()
+        for command, request, config in done:
+            if not command.view.is_valid():
+                continue
+
+            try:
+                with open(request[1], "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+
+            command.mark_sorted_file(request, config, runner, data)
+
+        timings.annotate(
+            fixed=stdout.count(b"Fixing "), failed=len(entries) - len(done)
+        )
+        if len(paths) > 1:
+            sublime.status_message(
+                "Pyisort: Sorted {count} saved files.".format(count=len(paths))
+            )
+
+    def head_failed(self, cmd, config, err_msg):
+        """Tell whether isort rejected an import head which is not whole code.
+
+        An isort config with atomic set only sorts code which compiles, which
+        the head rarely does as it stops inside the code after the imports.
+        Such requests get the whole buffer from now on.
+        """
+        if "ExistingSyntaxErrors" not in err_msg:
+            return False
+
+        logger.info("Pyisort: Sort the whole buffer for isort to compile it")
+        whole_buffer_requests.add((tuple(cmd), config))
+        return True
+
+    def isort_contents(
+        self, cmd, cwd, config, data, encoding, runner, partial=False, timeout=None
+    ):
+        """Return what isort prints for data, or None if isort failed."""
+        key = result_cache_key(cmd, config, data, encoding, runner)
+        stdout = result_cache.get(key, data)
+        timings.annotate(bytes_in=len(data), cache_hit=stdout is not None)
+        if stdout is None:
+            import subprocess
+
+            try:
+                stdout, stderr = isort_cmd(
+                    cmd,
+                    cwd=cwd,
+                    input=data,
+                    encoding=encoding,
+                    runner=runner,
+                    timeout=timeout,
+                )
+            except (OSError, subprocess.TimeoutExpired) as e:
+                err_msg = "Pyisort: Unable to run isort: {e}".format(e=e)
+                logger.error(err_msg)
+                sublime.status_message(err_msg)
+                return None
+
             if stderr:
                 err_msg = stderr.decode(encoding)
+                if partial and self.head_failed(cmd, config, err_msg):
+                    return None
+
                 logger.error(err_msg)
                 sublime.status_message("Pyisort: {err_msg}".format(err_msg=err_msg))
+                return None
+
+            result_cache.put(key, data, stdout)
+
+        timings.annotate(bytes_out=len(stdout))
+        return stdout
+
+    def sort_contents(
+        self, cmd, cwd, config, head, encoding, runner, contents=None, timeout=None
+    ):
+        """Return the hunks which sort the head, or None if isort failed.
+
+        If isort refuses the head of contents, contents is sorted instead.
+        """
+        partial = contents is not None and len(head) < len(contents)
+        data = head.encode(encoding)
+        stdout = self.isort_contents(
+            cmd, cwd, config, data, encoding, runner, partial, timeout
+        )
+        if stdout is None and partial and (tuple(cmd), config) in whole_buffer_requests:
+            head = contents
+            data = head.encode(encoding)
+            stdout = self.isort_contents(
+                cmd, cwd, config, data, encoding, runner, timeout=timeout
+            )
+        if stdout is None:
+            return None
+
+        sorted_heads.mark_sorted(
+            self.view.id(), self.head_request(cmd, config, encoding, runner), stdout
+        )
+        if stdout == data:
+            return []
+
+        # The head is a prefix of the buffer, so its offsets are buffer offsets.
+        with timings.span("decode"):
+            return compute_hunks(head, stdout.decode(encoding))
+
+    def lint(self):
+        """Mark the lines isort would change, leaving the buffer alone."""
+        view = self.view
+        filename = view.file_name()
+        isort_bin = get_isort_bin(view)
+        if not (view.is_valid() and filename and isort_bin):
+            return
+
+        encoding = get_encoding(view)
+        if not encoding or not is_python_syntax(view):
+            return
+
+        cmd, cwd, config, imports_only = self.buffer_request(
+            isort_bin, filename, get_options(view)
+        )
+        change_count = view.change_count()
+        runner = get_runner(view)
+        request = (tuple(cmd), encoding, imports_only)
+        # Focus changes ask again for the same buffer version.
+        lines = lint_results.get(view.id(), change_count, request)
+        if lines is None:
+            contents = view.substr(sublime.Region(0, view.size()))
+            head = self.import_head(contents, imports_only)
+            if self.precheck(
+                self.head_request(cmd, config, encoding, runner), head, encoding, False
+            ):
+                lines = []
+            else:
+                with timings.activate(timings.new_job(filename, TRIGGER_LINT)):
+                    lines = self.check_contents(
+                        cmd, cwd, config, head, encoding, runner, contents
+                    )
+            if lines is None or view.change_count() != change_count:
                 return
 
-            region = sublime.Region(0, self.view.size())
-            self.view.replace(edit, region, stdout.decode(encoding))
+            lint_results.put(view.id(), change_count, request, lines)
+
+        self.show_lint(lines)
+
+    def check_contents(self, cmd, cwd, config, head, encoding, runner, contents=None):
+        """Return the line ranges isort would change, or None if isort failed.
+
+        If isort refuses the head of contents, contents is checked instead.
+        """
+        data = head.encode(encoding)
+        check_cmd = cmd + ["--check-only", "--diff"]
+        key = result_cache_key(check_cmd, config, data, encoding, runner)
+        stdout = result_cache.get(key, data)
+        timings.annotate(bytes_in=len(data), cache_hit=stdout is not None)
+        if stdout is None:
+            import subprocess
+
+            try:
+                stdout, stderr = isort_cmd(
+                    check_cmd, cwd=cwd, input=data, encoding=encoding, runner=runner
+                )
+            except (OSError, subprocess.TimeoutExpired) as e:
+                err_msg = "Pyisort: Unable to run isort: {e}".format(e=e)
+                logger.error(err_msg)
+                sublime.status_message(err_msg)
+                return None
+
+            # Unsorted imports are reported on stderr next to the diff.
+            if stderr and not stdout:
+                err_msg = stderr.decode(encoding)
+                if (
+                    contents is not None
+                    and len(head) < len(contents)
+                    and self.head_failed(cmd, config, err_msg)
+                ):
+                    return self.check_contents(
+                        cmd, cwd, config, contents, encoding, runner
+                    )
+
+                logger.error(err_msg)
+                sublime.status_message("Pyisort: {err_msg}".format(err_msg=err_msg))
+                return None
+
+            result_cache.put(key, data, stdout)
+
+        if not stdout:
+            sorted_heads.mark_sorted(
+                self.view.id(), self.head_request(cmd, config, encoding, runner), data
+            )
+            return []
+
+        with timings.span("decode"):
+            return changed_lines(stdout.decode(encoding))
+
+    def show_lint(self, lines):
+        view = self.view
+        regions = [
+            sublime.Region(
+                view.text_point(first, 0), view.line(view.text_point(last, 0)).end()
+            )
+            for first, last in lines
+        ]
+        view.add_regions(
+            LINT_KEY,
+            regions,
+            "region.orangish",
+            "dot",
+            sublime.DRAW_NO_FILL
+            | sublime.DRAW_NO_OUTLINE
+            | sublime.DRAW_SQUIGGLY_UNDERLINE,
+        )
+        if regions:
+            view.set_status(LINT_KEY, "isort: imports are not sorted")
+        else:
+            view.erase_status(LINT_KEY)
+
+    def sort_regions(self, regions, cmd, cwd, config, encoding, runner, timeout=None):
+        """Return the hunks which sort every region on its own, or None.
+
+        The regions go to isort as a single request, split by comments which
+        make isort sort each of them apart.
+        """
+        texts = [self.view.substr(region) for region in regions]
+        joined, frames = join_fragments(texts)
+        stdout = self.isort_contents(
+            cmd, cwd, config, joined.encode(encoding), encoding, runner, timeout=timeout
+        )
+        if stdout is None:
+            return None
+
+        with timings.span("decode"):
+            fragments = split_fragments(stdout.decode(encoding), frames)
+        if fragments is None:
+            err_msg = "Pyisort: Unable to sort the selected regions apart."
+            logger.error(err_msg)
+            sublime.status_message(err_msg)
+            return None
+
+        return [
+            (region.begin(), region.end(), fragment)
+            for region, text, fragment in zip(regions, texts, fragments)
+            if fragment != text
+        ]
+
+    def sort_regions_async(
+        self, regions, cmd, cwd, config, encoding, runner, change_count, job
+    ):
+        with timings.activate(job):
+            hunks = self.sort_regions(regions, cmd, cwd, config, encoding, runner)
+        if hunks is None:
+            return
+
+        if not hunks:
+            if self.view.change_count() == change_count:
+                clear_edited(self.view, regions)
+            sublime.status_message("Pyisort: Imports are already sorted.")
+            return
+
+        self.view.run_command(
+            "pyisort_replace",
+            {
+                "hunks": hunks,
+                "change_count": change_count,
+                "regions": [[r.begin(), r.end()] for r in regions],
+            },
+        )
+
+    def sort_async(
+        self, cmd, cwd, config, head, encoding, runner, contents, change_count, job
+    ):
+        """Run isort off the UI thread and hand the result back to the view."""
+        with timings.activate(job):
+            if self.precheck(
+                self.head_request(cmd, config, encoding, runner), head, encoding, False
+            ):
+                hunks = []
+            else:
+                hunks = self.sort_contents(
+                    cmd, cwd, config, head, encoding, runner, contents
+                )
+        if hunks is None:
+            return
+
+        if not hunks:
+            sublime.status_message("Pyisort: Imports are already sorted.")
+            return
+
+        self.view.run_command(
+            "pyisort_replace", {"hunks": hunks, "change_count": change_count}
+        )
+
+
+class PyisortSelectionCommand(PyisortCommand):
+    """Sort the selected lines, or the import block at every cursor."""
+
+    def run(self, edit):
+        super().run(edit, selection=True)
+
+
+class PyisortLintCommand(sublime_plugin.TextCommand):
+    def run(self, edit):
+        lint_jobs.schedule(self.view.id(), PyisortCommand(self.view).lint)
+
+    def is_enabled(self):
+        return bool(self.view.file_name()) and is_python_syntax(self.view)
+
+
+class PyisortReplaceCommand(sublime_plugin.TextCommand):
+    def run(self, edit, hunks, change_count, regions=None):
+        """Apply the hunks of a sort of regions, or of the whole buffer."""
+        # Drop results computed for an older version of the buffer.
+        if self.view.change_count() != change_count:
+            err_msg = "Pyisort: The file was modified while sorting, skipped."
+            logger.warning(err_msg)
+            sublime.status_message(err_msg)
+            return
+
+        if regions is not None:
+            regions = [sublime.Region(begin, end) for begin, end in regions]
+        clear_edited(self.view, regions)
+        with timings.span("replace"):
+            replace_hunks(self.view, edit, hunks)
+
+    def is_visible(self):
+        return False
+
+
+class PyisortProjectCommand(sublime_plugin.WindowCommand):
+    def run(self, paths=[]):
+        isort_bin = get_isort_bin(self.window)
+        if not isort_bin:
+            err_msg = "Pyisort: Unable to find isort binary."
+            logger.error(err_msg)
+            sublime.status_message(err_msg)
+            return
+
+        roots = paths or self.window.folders()
+        if not roots:
+            err_msg = "Pyisort: Unable to find folders to sort."
+            logger.error(err_msg)
+            sublime.status_message(err_msg)
+            return
+
+        exclude_patterns = get_folder_exclude_patterns(self.window)
+        ProjectSort(
+            isort_bin,
+            get_options(self.window),
+            roots,
+            exclude_patterns,
+            get_config_index(self.window),
+        ).start()
+
+    def is_enabled(self, paths=[]):
+        return bool(paths or self.window.folders())
+
+
+class PyisortChangedCommand(sublime_plugin.WindowCommand):
+    def run(self, paths=[], base="", staged=False):
+        isort_bin = get_isort_bin(self.window)
+        if not isort_bin:
+            err_msg = "Pyisort: Unable to find isort binary."
+            logger.error(err_msg)
+            sublime.status_message(err_msg)
+            return
+
+        roots = paths or self.window.folders()
+        if not roots:
+            err_msg = "Pyisort: Unable to find folders to sort."
+            logger.error(err_msg)
+            sublime.status_message(err_msg)
+            return
+
+        args = (
+            isort_bin,
+            get_options(self.window),
+            roots,
+            get_config_index(self.window),
+            base or load_settings(self.window).get("isort_changed_base", "HEAD"),
+        )
+        if staged:
+            StagedSort(*args, runner=get_runner(self.window)).start()
+        else:
+            ChangedSort(*args).start()
+
+    def is_enabled(self, paths=[], base="", staged=False):
+        return bool(paths or self.window.folders())
+
+
+class PyisortCacheInfoCommand(sublime_plugin.WindowCommand):
+    def run(self):
+        sublime.message_dialog(
+            "Pyisort result cache\n\n"
+            "Entries: {size} / {maxsize}\n"
+            "Hits: {hits}\n"
+            "Misses: {misses}\n"
+            "Evictions: {evictions}".format(**result_cache.stats())
+        )
+
+
+class PyisortStatsCommand(sublime_plugin.WindowCommand):
+    def run(self):
+        report = (
+            "Pyisort processes\n\n"
+            "Live: {live}\n"
+            "Started: {started}\n"
+            "Killed: {killed}\n"
+            "Timed out: {timed_out}\n\n"
+            "Pyisort timings\n\n"
+        ).format(**process_stats())
+        if timings.enabled:
+            report += timings.report()
+        else:
+            report += 'Set "isort_timing": true to record sort timings.\n'
+
+        panel = self.window.create_output_panel("pyisort_stats")
+        panel.run_command("append", {"characters": report, "force": True})
+        self.window.run_command("show_panel", {"panel": "output.pyisort_stats"})
 
 
 class PyisortOnSave(sublime_plugin.EventListener):
+    def on_pre_save(self, view: sublime.View):
+        settings = load_settings(view)
+        if (
+            view.window()
+            and settings.get("isort_on_save", False)
+            and settings.get("isort_on_save_mode", "buffer") == "buffer"
+        ):
+            view.run_command("pyisort", {"pre_save": True})
+
     def on_post_save_async(self, view: sublime.View):
         settings = load_settings(view)
         window = view.window()
-        if window and settings.get("isort_on_save", False):
+        deferred = view.id() in deferred_saves
+        deferred_saves.discard(view.id())
+        if (
+            window
+            and settings.get("isort_on_save", False)
+            and (deferred or settings.get("isort_on_save_mode", "buffer") == "disk")
+        ):
             view.run_command("pyisort", {"auto_save": True})
+
+
+class PyisortViewCache(sublime_plugin.EventListener):
+    def on_close(self, view: sublime.View):
+        presort_results.discard(view.id())
+        sorted_heads.discard(view.id())
+        lint_results.discard(view.id())
+        sort_edits.discard(view.buffer_id())
+        deferred_saves.discard(view.id())
+
+
+class PyisortPresort(sublime_plugin.EventListener):
+    def on_modified_async(self, view: sublime.View):
+        settings = load_settings(view)
+        if not settings.get("isort_presort", False) or not view.file_name():
+            return
+
+        # Sort once typing pauses, replacing any pending sort of this view.
+        presort_results.discard(view.id())
+        presort_jobs.schedule(
+            view.id(),
+            PyisortCommand(view).presort,
+            settings.get("isort_presort_delay", 500),
+        )
+
+
+class PyisortSettingsListener(sublime_plugin.EventListener):
+    def on_load_project_async(self, window: sublime.Window):
+        clear_settings_cache(window)
+
+    def on_post_save_project_async(self, window: sublime.Window):
+        clear_settings_cache(window)
+
+    def on_pre_close_window(self, window: sublime.Window):
+        clear_settings_cache(window)
+
+    def on_post_save_async(self, view: sublime.View):
+        # Project data edited as a file is saved through a regular view.
+        if (view.file_name() or "").endswith(".sublime-project"):
+            clear_settings_cache()
+
+
+class PyisortLint(sublime_plugin.EventListener):
+    def on_load_async(self, view: sublime.View):
+        self.schedule(view)
+
+    def on_activated_async(self, view: sublime.View):
+        # Reuses the result of the unchanged buffer, so isort only runs once.
+        self.schedule(view)
+
+    def on_modified_async(self, view: sublime.View):
+        settings = load_settings(view)
+        if settings.get("isort_lint", False):
+            self.schedule(view, settings.get("isort_lint_delay", 500))
+        else:
+            # Drop the marks of a manual check once the buffer changes.
+            view.erase_regions(LINT_KEY)
+            view.erase_status(LINT_KEY)
+
+    def schedule(self, view: sublime.View, delay: int = 0):
+        if view.file_name() and load_settings(view).get("isort_lint", False):
+            lint_jobs.schedule(view.id(), PyisortCommand(view).lint, delay)
+
+
+class PyisortEditedRegions(sublime_plugin.TextChangeListener):
+    def on_text_changed_async(self, changes):
+        views = self.buffer.views()
+        if not views or not is_python_syntax(views[0]):
+            return
+
+        if not load_settings(views[0]).get("isort_edited_only", False):
+            return
+
+        buffer_id = self.buffer.id()
+        edited = []
+        for change in changes:
+            begin, end, size = change.a.pt, change.b.pt, len(change.str)
+            # Every change is at the positions left by the ones before it.
+            delta = size - (end - begin)
+            edited = [
+                (
+                    (b, e)
+                    if e < begin
+                    else (
+                        (b + delta, e + delta)
+                        if b > end
+                        else (min(b, begin), max(e + delta, begin + size))
+                    )
+                )
+                for b, e in edited
+            ]
+            if not sort_edits.take(buffer_id, begin, change.str):
+                edited.append((begin, begin + size))
+
+        if not edited:
+            return
+
+        # Regions move along with the text, so they track later edits for
+        # free. Typing on before this runs may leave them a few characters
+        # off, which matching whole import blocks by overlap absorbs.
+        for view in views:
+            regions = view.get_regions(EDITED_KEY)
+            regions.extend(sublime.Region(b, e) for b, e in edited)
+            view.add_regions(EDITED_KEY, merge_regions(regions), "", "", sublime.HIDDEN)
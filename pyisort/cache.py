@@ -0,0 +1,200 @@
+import threading
+from collections import OrderedDict
+
+from .constants import RESULT_CACHE_SIZE
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import Any, Dict, Hashable, List, Set, Tuple, Union
+
+# Stored instead of the output when isort left the input untouched.
+ALREADY_SORTED = object()
+
+
+class ResultCache:
+    """A bounded LRU of isort outputs keyed by input and isort configuration."""
+
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+
+    def get(self, key: "Hashable", input: bytes) -> "Union[bytes, None]":
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+
+        return input if value is ALREADY_SORTED else value
+
+    def put(self, key: "Hashable", input: bytes, output: bytes):
+        with self._lock:
+            self._data[key] = ALREADY_SORTED if output == input else output
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> "Dict[str, Any]":
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class PresortResults:
+    """The latest speculative sort of every view, tagged by its change count.
+
+    A result only applies to the exact buffer version and isort request it
+    was computed for, and is used at most once.
+    """
+
+    def __init__(self):
+        self._data = {}  # type: Dict[int, Tuple[int, Hashable, List]]
+        self._lock = threading.Lock()
+
+    def put(self, view_id: int, change_count: int, request: "Hashable", hunks: list):
+        with self._lock:
+            self._data[view_id] = (change_count, request, hunks)
+
+    def take(
+        self, view_id: int, change_count: int, request: "Hashable"
+    ) -> "Union[list, None]":
+        with self._lock:
+            entry = self._data.pop(view_id, None)
+
+        if entry is None or entry[:2] != (change_count, request):
+            return None
+
+        return entry[2]
+
+    def discard(self, view_id: int):
+        with self._lock:
+            self._data.pop(view_id, None)
+
+
+class SortedHeads:
+    """Digests of the last sorted import head of every view.
+
+    A head which isort returned unchanged for a request, is sorted for that
+    request, so a view whose head still has the same digest needs no sort.
+    """
+
+    def __init__(self):
+        self._data = {}  # type: Dict[int, Tuple[Hashable, str]]
+        self._lock = threading.Lock()
+
+    def is_sorted(self, view_id: int, request: "Hashable", head: bytes) -> bool:
+        with self._lock:
+            entry = self._data.get(view_id)
+
+        return entry is not None and entry == (request, _digest(head))
+
+    def mark_sorted(self, view_id: int, request: "Hashable", head: bytes):
+        digest = _digest(head)
+        with self._lock:
+            self._data[view_id] = (request, digest)
+
+    def discard(self, view_id: int):
+        with self._lock:
+            self._data.pop(view_id, None)
+
+
+class LintResults:
+    """The lines isort would change in every view, tagged by its change count.
+
+    Unlike a presort result, a lint result stays valid for as long as the
+    buffer and the isort request are unchanged, so it is reused as often as
+    the view asks for it.
+    """
+
+    def __init__(self):
+        self._data = {}  # type: Dict[int, Tuple[int, Hashable, List]]
+        self._lock = threading.Lock()
+
+    def get(
+        self, view_id: int, change_count: int, request: "Hashable"
+    ) -> "Union[list, None]":
+        with self._lock:
+            entry = self._data.get(view_id)
+
+        if entry is None or entry[:2] != (change_count, request):
+            return None
+
+        return entry[2]
+
+    def put(self, view_id: int, change_count: int, request: "Hashable", lines: list):
+        with self._lock:
+            self._data[view_id] = (change_count, request, lines)
+
+    def discard(self, view_id: int):
+        with self._lock:
+            self._data.pop(view_id, None)
+
+
+class SortEdits:
+    """The replacements a sort made in every buffer, until they are reported.
+
+    Text change listeners see them like any other edit, but the imports a
+    sort just wrote are not edits to sort again.
+    """
+
+    def __init__(self):
+        self._data = {}  # type: Dict[int, List[Tuple[int, str]]]
+        self._lock = threading.Lock()
+
+    def add(self, buffer_id: int, begin: int, text: str):
+        with self._lock:
+            self._data.setdefault(buffer_id, []).append((begin, text))
+
+    def take(self, buffer_id: int, begin: int, text: str) -> bool:
+        """Tell whether a change is one of the replacements, forgetting it."""
+        with self._lock:
+            edits = self._data.get(buffer_id)
+            if not edits or (begin, text) not in edits:
+                return False
+
+            edits.remove((begin, text))
+            if not edits:
+                del self._data[buffer_id]
+            return True
+
+    def discard(self, buffer_id: int):
+        with self._lock:
+            self._data.pop(buffer_id, None)
+
+
+def _digest(data: bytes) -> str:
+    import hashlib
+
+    return hashlib.sha1(data).hexdigest()
+
+
+# Requests, as (command, config digest), for which isort refused the import
+# head, since the config asks it to check that the code compiles.
+whole_buffer_requests = set()  # type: Set[Hashable]
+
+# Views whose sort before a save was left to after the save.
+deferred_saves = set()  # type: Set[int]
+
+result_cache = ResultCache()
+presort_results = PresortResults()
+lint_results = LintResults()
+sorted_heads = SortedHeads()
+sort_edits = SortEdits()
@@ -0,0 +1,240 @@
+import os
+import re
+import threading
+import time
+
+from .constants import (
+    CONFIG_INDEX_TTL,
+    ISORT_CONFIG_FILES,
+    ISORT_CONFIG_SECTIONS,
+    MAX_CONFIG_SEARCH_DEPTH,
+    STOP_CONFIG_SEARCH_DIRS,
+)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import Any, Dict, List, Tuple
+
+TABLE_RE = re.compile(r"^\[\s*([^\[\]]+?)\s*\]\s*(#.*)?$")
+KEY_PART_RE = re.compile(r"\s*(?:\"([^\"]*)\"|'([^']*)'|([A-Za-z0-9_-]+))\s*(\.|$)")
+
+
+def _toml_key(text: str) -> "List[str]":
+    """Split a dotted toml key, like tool."isort", into its parts."""
+    parts = []  # type: List[str]
+    pos = 0
+    while pos < len(text):
+        match = KEY_PART_RE.match(text, pos)
+        if not match or match.end() == pos:
+            return []
+
+        parts.append(next(part for part in match.groups()[:3] if part is not None))
+        pos = match.end()
+
+    return parts
+
+
+def _scan_toml(text: str) -> bool:
+    """Tell whether toml sets anything under tool.isort, without a toml parser.
+
+    It follows tables, dotted keys and inline tables, which is what isort
+    configs are written with.
+    """
+    table = []  # type: List[str]
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line[0] == "#":
+            continue
+
+        if line[0] == "[":
+            match = TABLE_RE.match(line)
+            # Keys of arrays of tables never make up tool.isort.
+            table = _toml_key(match.group(1)) if match else ["["]
+            continue
+
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+
+        path = table + _toml_key(key)
+        if path[:2] != ["tool", "isort"]:
+            continue
+
+        value = value.split("#", 1)[0].strip()
+        if len(path) > 2 or value.replace(" ", "") not in ("", "{}"):
+            return True
+
+    return False
+
+
+def _read_toml(text: str) -> "Dict[str, Any]":
+    try:
+        import tomllib
+    except ImportError:
+        import tomli as tomllib  # type: ignore
+
+    return tomllib.loads(text)
+
+
+def _toml_has_isort(text: str) -> bool:
+    try:
+        data = _read_toml(text)
+    except ImportError:
+        # Python before 3.11 has no toml parser of its own.
+        return _scan_toml(text)
+
+    section = data
+    for key in ISORT_CONFIG_SECTIONS["pyproject.toml"][0].split("."):
+        section = section.get(key, {})
+    return bool(dict(section))
+
+
+def _ini_has_isort(name: str, text: str) -> bool:
+    import configparser
+
+    if name == ".editorconfig":
+        # Like isort, skip what precedes the first section.
+        lines = text.splitlines(True)
+        first = next((i for i, line in enumerate(lines) if "[" in line), len(lines))
+        text = "".join(lines[first:])
+
+    config = configparser.ConfigParser(strict=False)
+    config.read_string(text)
+    settings = {}  # type: Dict[str, Any]
+    for section in ISORT_CONFIG_SECTIONS[name]:
+        if section.startswith("*.{") and section.endswith("}"):
+            # Editorconfig sections like [*.{py,pyi}] apply to python files.
+            extension = section[3:-1]
+            for key in config.keys():
+                if (
+                    key.startswith("*.{")
+                    and key.endswith("}")
+                    and extension in (ext.strip() for ext in key[3:-1].split(","))
+                ):
+                    settings.update(config.items(key))
+        elif config.has_section(section):
+            settings.update(config.items(section))
+
+    return bool(settings)
+
+
+def has_isort_config(name: str, text: str) -> bool:
+    """Tell whether isort takes its settings from a config file.
+
+    The file is read the way isort reads it, so a file isort fails to read
+    does not count either, like it does not for isort.
+    """
+    try:
+        if name == "pyproject.toml":
+            return _toml_has_isort(text)
+
+        return _ini_has_isort(name, text)
+    except Exception:
+        return False
+
+
+class ConfigIndex:
+    """Map directories to the isort config file which applies to them.
+
+    Every directory is read once and remembers its own config file, if any,
+    so resolving many files of a tree costs one read per directory. Entries
+    are checked against the mtime of the directory and of its config
+    candidates again once they are older than the ttl.
+    """
+
+    def __init__(self, ttl: float = CONFIG_INDEX_TTL):
+        self.ttl = ttl
+        self._entries = {}  # type: Dict[str, Dict[str, Any]]
+        self._lock = threading.Lock()
+
+    def resolve(self, folder: str) -> "Tuple[str, str]":
+        """Return the config file which applies to folder and its digest.
+
+        Both are empty if isort would use its default settings.
+        """
+        folder = os.path.abspath(folder)
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(MAX_CONFIG_SEARCH_DEPTH):
+                entry = self._entry(folder, now)
+                if entry["config"]:
+                    return entry["config"], entry["digest"]
+
+                parent = os.path.dirname(folder)
+                if entry["stop"] or parent == folder:
+                    break
+
+                folder = parent
+
+        return "", ""
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _entry(self, folder: str, now: float) -> "Dict[str, Any]":
+        entry = self._entries.get(folder)
+        if entry is not None and now - entry["checked"] < self.ttl:
+            return entry
+
+        if entry is None or self._stamp(folder, entry["files"]) != entry["stamp"]:
+            entry = self._entries[folder] = self._scan(folder)
+        entry["checked"] = now
+        return entry
+
+    @staticmethod
+    def _stat(path: str) -> "Tuple[float, int]":
+        try:
+            st = os.stat(path)
+        except OSError:
+            return (0.0, -1)
+
+        return (st.st_mtime, st.st_size)
+
+    def _stamp(self, folder: str, files: "Tuple[str, ...]") -> "Tuple":
+        # Adding or removing a file changes the directory, editing one in
+        # place only changes the file.
+        return (self._stat(folder),) + tuple(
+            self._stat(os.path.join(folder, name)) for name in files
+        )
+
+    def _scan(self, folder: str) -> "Dict[str, Any]":
+        import hashlib
+
+        try:
+            names = set(os.listdir(folder))
+        except OSError:
+            names = set()
+
+        files = tuple(name for name in ISORT_CONFIG_FILES if name in names)
+        entry = {
+            "files": files,
+            "stamp": self._stamp(folder, files),
+            "config": "",
+            "digest": "",
+            "stop": any(name in names for name in STOP_CONFIG_SEARCH_DIRS),
+        }  # type: Dict[str, Any]
+        for name in files:
+            path = os.path.join(folder, name)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+
+            try:
+                text = data.decode("utf-8")
+            except UnicodeDecodeError:
+                continue
+
+            if has_isort_config(name, text):
+                entry["config"] = path
+                entry["digest"] = hashlib.sha1(data).hexdigest()
+                break
+
+        return entry
+
+
+def settings_path_args(config: str) -> "List[str]":
+    """Point isort at a resolved config, so it skips looking for one."""
+    return ["--settings-path", config] if config else []
@@ -4,3 +4,63 @@ PACKAGE_FILE_NAME = "{PACKAGE_NAME}.sublime-package".format(PACKAGE_NAME=PACKAGE
 SETTINGS_FILE_NAME = "{PACKAGE_NAME}.sublime-settings".format(PACKAGE_NAME=PACKAGE_NAME)
 DEFAULT_ENCODING = "UTF-8"
 UNDEFINED_ENCODING = "Undefined"
+# Package settings merged under the project settings of every window.
+SETTINGS_KEYS = (
+    "isort_bin",
+    "isort_changed_base",
+    "isort_edited_only",
+    "isort_imports_only",
+    "isort_lint",
+    "isort_lint_delay",
+    "isort_on_save",
+    "isort_on_save_batch_size",
+    "isort_on_save_debounce",
+    "isort_on_save_mode",
+    "isort_pre_save_timeout",
+    "isort_precheck",
+    "isort_presort",
+    "isort_presort_delay",
+    "isort_runner",
+    "options",
+)
+# Config files isort looks for in the directory of a file and its parents.
+ISORT_CONFIG_FILES = (
+    ".isort.cfg",
+    "pyproject.toml",
+    "setup.cfg",
+    "tox.ini",
+    ".editorconfig",
+)
+# The sections isort reads from each config file.
+ISORT_CONFIG_SECTIONS = {
+    ".isort.cfg": ("settings", "isort"),
+    "pyproject.toml": ("tool.isort",),
+    "setup.cfg": ("isort", "tool:isort"),
+    "tox.ini": ("isort", "tool:isort"),
+    ".editorconfig": ("*", "*.py", "**.py", "*.{py}"),
+}
+# Like isort, stop looking for a config at the root of a repository or after
+# this many parent directories.
+STOP_CONFIG_SEARCH_DIRS = (".git", ".hg")
+MAX_CONFIG_SEARCH_DEPTH = 25
+# Seconds a resolved config is trusted before its directory is checked again.
+CONFIG_INDEX_TTL = 1
+RESULT_CACHE_SIZE = 256
+# Upper bound of the files passed to a single isort run.
+MAX_BATCH_FILES = 100
+# Files known to be sorted are remembered across sessions in cache files
+# named by this prefix, one file per isort binary, version and options.
+SORTED_CACHE_PREFIX = "sorted-"
+SORTED_CACHE_FILES = 8
+SORTED_CACHE_SIZE = 100000
+# Durations kept per sort phase, and the upper bounds in milliseconds of the
+# histogram buckets shown by the stats command.
+TIMING_SAMPLES = 1000
+TIMING_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# Trace files rotate at this size in bytes, keeping this many old files.
+TRACE_FILE_SIZE = 10 * 1024 * 1024
+TRACE_FILE_BACKUPS = 3
+# Region and status keys of the lines a check-only run marks as unsorted.
+LINT_KEY = "pyisort_lint"
+# Hidden regions of the text edited since the last sort.
+EDITED_KEY = "pyisort_edited"
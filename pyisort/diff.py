@@ -0,0 +1,88 @@
+import re
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import List, Tuple
+
+# Above this many differing lines a single replacement is cheaper to compute
+# than a line diff, and it is still limited to the changed middle of the file.
+MAX_DIFF_LINES = 5000
+
+HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+\d+(?:,\d+)? @@")
+
+
+def compute_hunks(old: str, new: str) -> "List[Tuple[int, int, str]]":
+    """Return the (begin, end, text) replacements which turn old into new.
+
+    Offsets point into old and the hunks are ordered from the top of the text,
+    so they must be applied bottom-up to keep the offsets valid.
+    """
+    import difflib
+
+    if old == new:
+        return []
+
+    a = old.splitlines(True)
+    b = new.splitlines(True)
+
+    # Most sorts only touch the import header, so trim the common lines at both
+    # ends before diffing what is left.
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+
+    a_mid = a[prefix : len(a) - suffix]
+    b_mid = b[prefix : len(b) - suffix]
+    offsets = [sum(len(line) for line in a[:prefix])]
+    for line in a_mid:
+        offsets.append(offsets[-1] + len(line))
+
+    if len(a_mid) + len(b_mid) > MAX_DIFF_LINES:
+        return [(offsets[0], offsets[-1], "".join(b_mid))]
+
+    hunks = []
+    matcher = difflib.SequenceMatcher(None, a_mid, b_mid, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            hunks.append((offsets[i1], offsets[i2], "".join(b_mid[j1:j2])))
+
+    return hunks
+
+
+def changed_lines(diff: str) -> "List[Tuple[int, int]]":
+    """Return the (first, last) lines of the old text which a diff changes.
+
+    Lines are counted from zero, and an insertion marks the line it goes
+    in front of. Adjacent changes are merged into one range.
+    """
+    ranges = []  # type: List[Tuple[int, int]]
+    line = -1
+    for text in diff.splitlines():
+        match = HUNK_RE.match(text)
+        if match:
+            # An empty range starts after the line it names.
+            line = int(match.group(1)) - (0 if match.group(2) == "0" else 1)
+            continue
+
+        if line < 0 or not text or text[0] not in "-+ ":
+            # File headers before the first hunk and "\ No newline" notes.
+            continue
+
+        if text[0] == " ":
+            line += 1
+            continue
+
+        if ranges and ranges[-1][1] >= line - 1:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], line))
+        else:
+            ranges.append((line, line))
+        if text[0] == "-":
+            line += 1
+
+    return ranges
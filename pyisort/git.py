@@ -0,0 +1,164 @@
+import os
+
+from .process import communicate, popen
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import Dict, Iterable, List, Tuple, Union
+
+
+class GitError(Exception):
+    """A git command failed."""
+
+
+def git(root: str, args: "List[str]", input: "Union[bytes, None]" = None) -> bytes:
+    """Run a git command in root and return its output."""
+    import subprocess
+
+    try:
+        proc = popen(
+            ["git"] + args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=root,
+        )
+        stdout, stderr = communicate(proc, input)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise GitError(str(e))
+
+    if proc.returncode:
+        raise GitError(stderr.decode("utf-8", "replace").strip())
+
+    return stdout
+
+
+def _paths(output: bytes) -> "List[str]":
+    return [os.fsdecode(path) for path in output.split(b"\0") if path]
+
+
+def find_root(folder: str) -> str:
+    """Return the top level folder of the work tree folder is in, or ""."""
+    try:
+        output = git(folder, ["rev-parse", "--show-toplevel"])
+    except GitError:
+        return ""
+
+    # Git resolves symlinks, so this is the real path of the work tree.
+    return os.path.realpath(os.fsdecode(output.strip()))
+
+
+def has_commits(root: str) -> bool:
+    """Tell whether the current branch of the work tree has a commit yet."""
+    try:
+        git(root, ["rev-parse", "--verify", "-q", "HEAD"])
+    except GitError:
+        return False
+
+    return True
+
+
+def changed_files(root: str, base: str = "HEAD") -> "List[str]":
+    """List the python files which are modified, staged or untracked.
+
+    Modified and staged files are those which differ from the commit where
+    the current branch forked from base, so files changed by commits of the
+    branch count as well. Before the first commit, every file in the index
+    is new.
+    """
+    try:
+        fork_point = git(root, ["merge-base", base, "HEAD"]).strip().decode()
+    except GitError:
+        fork_point = base
+
+    try:
+        names = _paths(
+            git(root, ["diff", "--name-only", "-z", "--diff-filter=d", fork_point])
+        )
+    except GitError:
+        if has_commits(root):
+            raise
+
+        names = _paths(git(root, ["ls-files", "-z"]))
+    names += _paths(git(root, ["ls-files", "--others", "--exclude-standard", "-z"]))
+    return sorted(
+        set(os.path.join(root, name) for name in names if name.endswith(".py"))
+    )
+
+
+def staged_files(root: str) -> "Dict[str, Tuple[str, str]]":
+    """Map the staged python files to the mode and id of their blob."""
+    names = _paths(
+        git(root, ["diff", "--cached", "--name-only", "-z", "--diff-filter=d"])
+    )
+    names = [name for name in names if name.endswith(".py")]
+    if not names:
+        return {}
+
+    staged = {}  # type: Dict[str, Tuple[str, str]]
+    for line in git(root, ["ls-files", "--stage", "-z", "--"] + names).split(b"\0"):
+        if not line:
+            continue
+
+        # Lines read "<mode> <object> <stage>\t<path>".
+        info, _, name = line.partition(b"\t")
+        mode, blob, _ = info.decode().split(" ")
+        staged[os.path.join(root, os.fsdecode(name))] = (mode, blob)
+
+    return staged
+
+
+def read_blobs(root: str, blobs: "Iterable[str]") -> "Dict[str, bytes]":
+    """Read the contents of many blobs with a single git process."""
+    blobs = list(blobs)
+    output = git(root, ["cat-file", "--batch"], "\n".join(blobs).encode() + b"\n")
+    contents = {}  # type: Dict[str, bytes]
+    offset = 0
+    for blob in blobs:
+        # Every blob is "<object> <type> <size>\n<contents>\n".
+        end = output.index(b"\n", offset)
+        size = int(output[offset:end].split(b" ")[2])
+        contents[blob] = output[end + 1 : end + 1 + size]
+        offset = end + 1 + size + 1
+
+    return contents
+
+
+def write_blobs(root: str, contents: "List[bytes]") -> "List[str]":
+    """Store many blobs with a single git process and return their ids."""
+    import shutil
+    import tempfile
+
+    folder = tempfile.mkdtemp(prefix="pyisort-")
+    try:
+        paths = []
+        for index, data in enumerate(contents):
+            path = os.path.join(folder, str(index))
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+
+        output = git(
+            root,
+            ["hash-object", "-w", "--no-filters", "--stdin-paths"],
+            "\n".join(paths).encode() + b"\n",
+        )
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return output.decode().split()
+
+
+def update_index(root: str, entries: "Iterable[Tuple[str, str, str]]"):
+    """Point (mode, blob, path) entries of the index at new blobs.
+
+    The work tree is left alone.
+    """
+    lines = [
+        "{mode} {blob}\t{path}".format(
+            mode=mode, blob=blob, path=os.path.relpath(path, root).replace(os.sep, "/")
+        )
+        for mode, blob, path in entries
+    ]
+    if lines:
+        git(root, ["update-index", "--index-info"], "\n".join(lines).encode() + b"\n")
@@ -0,0 +1,152 @@
+import re
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import List, Tuple, Union
+
+IMPORT_RE = re.compile(r"^[ \t]*(?:import[ \t]+\S|from[ \t]+\S+[ \t]+c?import\b)", re.M)
+SKIP_FILE_RE = re.compile(r"isort\s*:\s*skip_file")
+# isort sorts the code on either side of this comment on its own.
+SPLIT_COMMENT = "# isort: split"
+
+
+def has_imports(text: str) -> bool:
+    return IMPORT_RE.search(text) is not None
+
+
+def _statement_end(text: str, start: int) -> int:
+    """Return the offset after the logical line which begins at start."""
+    depth = 0
+    pos = start
+    while pos < len(text):
+        newline = text.find("\n", pos)
+        end = len(text) if newline == -1 else newline + 1
+        line = text[pos:end]
+        depth += line.count("(") - line.count(")")
+        pos = end
+        if depth <= 0 and not line.rstrip().endswith("\\"):
+            break
+
+    return pos
+
+
+def find_import_head(text: str) -> "Union[int, None]":
+    """Return the offset where the part of the text isort may rewrite ends.
+
+    The head covers every import statement, including nested ones, and the
+    first line of code after the last import, which isort looks at to decide
+    how many blank lines follow the imports. None means the whole text has to
+    be sorted, because there is no import or the head would be the whole text.
+    """
+    if SKIP_FILE_RE.search(text):
+        return None
+
+    last = None
+    for last in IMPORT_RE.finditer(text):
+        pass
+
+    if last is None:
+        return None
+
+    pos = _statement_end(text, last.start())
+    # Keep the blank lines and comments after the imports and the first line
+    # of code which follows them.
+    while pos < len(text):
+        newline = text.find("\n", pos)
+        end = len(text) if newline == -1 else newline + 1
+        line = text[pos:end].strip()
+        pos = end
+        if line and not line.startswith("#"):
+            break
+
+    return pos if pos < len(text) else None
+
+
+def _indent(line: str) -> str:
+    return line[: len(line) - len(line.lstrip(" \t"))]
+
+
+def find_import_blocks(text: str) -> "List[Tuple[int, int]]":
+    """Return the (begin, end) offsets of every block of import statements.
+
+    A block runs from the start of the line of its first import to the end
+    of its last import statement. Its statements are indented alike and only
+    blank lines and comments come between them.
+    """
+    if SKIP_FILE_RE.search(text):
+        return []
+
+    blocks = []  # type: List[List]
+    for match in IMPORT_RE.finditer(text):
+        begin = match.start()
+        if blocks and begin < blocks[-1][1]:
+            # Part of a statement which spans several lines.
+            continue
+
+        end = _statement_end(text, begin)
+        indent = _indent(match.group())
+        gap = text[blocks[-1][1] : begin] if blocks else ""
+        if (
+            blocks
+            and blocks[-1][2] == indent
+            and all(
+                not line.strip() or line.strip().startswith("#")
+                for line in gap.splitlines()
+            )
+        ):
+            blocks[-1][1] = end
+        else:
+            blocks.append([begin, end, indent])
+
+    return [(begin, end) for begin, end, _ in blocks]
+
+
+def join_fragments(
+    fragments: "List[str]",
+) -> "Tuple[str, List[Tuple[str, str, str]]]":
+    """Join whole-line fragments of code so one isort run sorts each apart.
+
+    Every fragment is dedented and stripped of its surrounding blank lines,
+    which are returned as a (leading, indent, trailing) frame per fragment.
+    """
+    bodies = []
+    frames = []
+    for fragment in fragments:
+        body = fragment.strip()
+        lead = fragment[: len(fragment) - len(fragment.lstrip())]
+        trail = fragment[len(fragment.rstrip()) :]
+        # Keep the indentation of the first line, not the lines before it.
+        indent = _indent(lead[lead.rfind("\n") + 1 :])
+        lead = lead[: len(lead) - len(indent)]
+        lines = (indent + body).splitlines()
+        if any(line.strip() and not line.startswith(indent) for line in lines):
+            indent = ""
+        bodies.append("\n".join(line[len(indent) :] for line in lines))
+        frames.append((lead, indent, trail))
+
+    return ("\n" + SPLIT_COMMENT + "\n").join(bodies) + "\n", frames
+
+
+def split_fragments(
+    text: str, frames: "List[Tuple[str, str, str]]"
+) -> "Union[List[str], None]":
+    """Split the isort output of joined fragments back into the fragments.
+
+    None means the output does not hold as many fragments as were joined.
+    """
+    parts = [[]]  # type: List[List[str]]
+    for line in text.splitlines():
+        if line.strip() == SPLIT_COMMENT:
+            parts.append([])
+        else:
+            parts[-1].append(line)
+
+    if len(parts) != len(frames):
+        return None
+
+    fragments = []
+    for lines, (lead, indent, trail) in zip(parts, frames):
+        body = "\n".join(indent + line if line.strip() else "" for line in lines)
+        fragments.append(lead + body.strip("\n") + trail)
+
+    return fragments
@@ -0,0 +1,140 @@
+import threading
+from collections import OrderedDict
+
+import sublime
+
+from .scheduler import BATCH, ON_SAVE, get_scheduler
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import Any, Callable, Dict, Hashable, List
+
+
+class JobTable:
+    """Coalesce jobs per key so that at most one of them runs at a time.
+
+    Every request replaces the pending job of its key and restarts the
+    debounce delay. A job which is still queued when a newer request arrives
+    is cancelled, and a running job is followed by one more run of the latest
+    request once it finishes.
+    """
+
+    def __init__(self, priority: int = ON_SAVE):
+        self.priority = priority
+        self._jobs = {}  # type: Dict[Hashable, Dict[str, Any]]
+        self._lock = threading.Lock()
+
+    def schedule(self, key: "Hashable", fn: "Callable[[], Any]", delay: int = 0):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                job = self._jobs[key] = {
+                    "generation": 0,
+                    "waiting": 0,
+                    "future": None,
+                    "rerun": False,
+                }
+
+            job["generation"] += 1
+            job["waiting"] += 1
+            job["fn"] = fn
+            generation = job["generation"]
+            if job["future"] is not None and job["future"].cancel():
+                job["future"] = None
+
+        sublime.set_timeout_async(lambda: self._submit(key, generation), delay)
+
+    def running(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["future"] is not None)
+
+    def _submit(self, key: "Hashable", generation: int):
+        with self._lock:
+            job = self._jobs[key]
+            job["waiting"] -= 1
+            if job["generation"] != generation:
+                # A newer request is still in its debounce delay.
+                return
+
+            if job["future"] is not None:
+                job["rerun"] = True
+                return
+
+            job["future"] = get_scheduler().submit(
+                self._run, key, priority=self.priority
+            )
+
+    def _run(self, key: "Hashable"):
+        with self._lock:
+            job = self._jobs[key]
+            fn = job["fn"]
+            job["rerun"] = False
+
+        try:
+            fn()
+        finally:
+            with self._lock:
+                job["future"] = None
+                if job["rerun"]:
+                    job["rerun"] = False
+                    job["future"] = get_scheduler().submit(
+                        self._run, key, priority=self.priority
+                    )
+                elif job["waiting"] == 0:
+                    del self._jobs[key]
+
+
+class SaveBatch:
+    """Gather items which arrive close together and hand them over at once.
+
+    Every item restarts the window, and a full batch is handed over without
+    waiting for it. Items of the same key replace each other. The batches
+    run through a job table, so one batch runs at a time and items which
+    arrive meanwhile form the next one.
+    """
+
+    def __init__(self, jobs: JobTable, key: "Hashable"):
+        self.jobs = jobs
+        self.key = key
+        self.size = 1
+        self._fn = None  # type: Any
+        self._pending = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        key: "Hashable",
+        item: "Any",
+        fn: "Callable[[List[Any]], Any]",
+        window: int = 0,
+        size: int = 1,
+    ):
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending[key] = item
+            self._fn = fn
+            self.size = max(1, size)
+            full = len(self._pending) >= self.size
+
+        self.jobs.schedule(self.key, self._flush, 0 if full else window)
+
+    def _flush(self):
+        with self._lock:
+            fn = self._fn
+            keys = list(self._pending)[: self.size]
+            batch = [self._pending.pop(key) for key in keys]
+            left = bool(self._pending)
+
+        if left:
+            self.jobs.schedule(self.key, self._flush)
+        if batch:
+            fn(batch)
+
+
+save_jobs = JobTable(ON_SAVE)
+# Files saved close together, sorted by a single isort run.
+save_batch = SaveBatch(save_jobs, "on-save batch")
+# Speculative sorts of edited buffers, at most one per view at a time.
+presort_jobs = JobTable(BATCH)
+# Check-only runs which mark unsorted imports, at most one per view at a time.
+lint_jobs = JobTable(BATCH)
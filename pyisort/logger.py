@@ -1,9 +1,14 @@
 import logging
 import os
-from logging.config import dictConfig
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
 
-from .constants import PACKAGE_NAME
-from .typing import Union
+from .constants import PACKAGE_NAME, TRACE_FILE_BACKUPS, TRACE_FILE_SIZE
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import Dict, List, Union
 
 
 class LogLevel:
@@ -30,7 +35,7 @@ class LogLevel:
                 self.DEBUG,
                 self.NOTSET,
             )
-            else self.DEBUG
+            else self.WARNING
         )
 
     @property
@@ -40,32 +45,60 @@ class LogLevel:
 
 LOG_LEVEL = LogLevel(os.getenv("LOG_LEVEL", "")).value
 LOG_FMT = "[%(asctime)s.%(msecs)03d][%(levelname)s][%(module)s][%(funcName)s,%(lineno)s]: %(message)s"
-CONFIG = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {"standard": {"format": LOG_FMT, "datefmt": "%Y-%m-%dT%H:%M:%S"}},
-    "handlers": {
-        "stream": {
-            "level": LOG_LEVEL,
-            "formatter": "standard",
-            "class": "logging.StreamHandler",
-            "stream": "ext://sys.stdout",  # Default is stderr
-        },
-    },
-    "loggers": {
-        # Specific logger for seasalt
-        PACKAGE_NAME: {
-            "handlers": ["stream"],
-            "level": LOG_LEVEL,
-            "propagate": False,
-        }
-    },
-}
-
-dictConfig(CONFIG)
-
-
-def get_logger(handlers: Union[list, None] = None):
+LOG_DATEFMT = "%Y-%m-%dT%H:%M:%S"
+TRACE_LOGGER_NAME = "{PACKAGE_NAME}.trace".format(PACKAGE_NAME=PACKAGE_NAME)
+# Formats of the trace file.
+TRACE_FORMATS = ("jsonl", "chrome")
+
+
+# Background listeners which write the queued records of each logger.
+_listeners = {}  # type: Dict[str, QueueListener]
+
+
+def _set_handlers(logger: logging.Logger, handlers: "List[logging.Handler]"):
+    """Queue the records of logger and write them from a background thread.
+
+    The thread which logs only formats the message, so a sort never waits
+    for the console or a file.
+    """
+    listener = _listeners.pop(logger.name, None)
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+    logger.handlers = []
+    if handlers:
+        records = queue.Queue()  # type: queue.Queue
+        listener = _listeners[logger.name] = QueueListener(records, *handlers)
+        listener.start()
+        logger.handlers = [QueueHandler(records)]
+
+
+def configure():
+    """Set up the package logger, like dictConfig but without importing it."""
+    handler = logging.StreamHandler(sys.stdout)  # Default is stderr
+    handler.setLevel(LOG_LEVEL)
+    handler.setFormatter(logging.Formatter(LOG_FMT, LOG_DATEFMT))
+    # Specific logger for pyisort
+    logger = logging.getLogger(PACKAGE_NAME)
+    _set_handlers(logger, [handler])
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+
+def shutdown_logging():
+    """Write out the queued records and stop the background listeners."""
+    global _trace_config
+    _trace_config = ("", "")
+    for name in list(_listeners):
+        _set_handlers(logging.getLogger(name), [])
+
+
+configure()
+
+
+def get_logger(handlers: "Union[list, None]" = None):
     """Get logger and support additional custom handers in different classes."""
     logger = logging.getLogger(name=PACKAGE_NAME)
     hdlr_names = [h.__class__.__name__ for h in logger.handlers]
@@ -78,3 +111,45 @@ def get_logger(handlers: Union[list, None] = None):
             logger.handlers.append(hdlr)
 
     return logger
+
+
+def get_trace_logger():
+    """Get the logger which receives a record for every finished sort job."""
+    return logging.getLogger(name=TRACE_LOGGER_NAME)
+
+
+_trace_config = ("", "")
+
+
+def configure_trace(path: str = "", fmt: str = "jsonl") -> bool:
+    """Stream job records to a rotating file, return whether tracing is on.
+
+    An empty path stops tracing. The file holds one JSON object per line for
+    "jsonl", or trace events a trace viewer loads for "chrome".
+    """
+    global _trace_config
+    if fmt not in TRACE_FORMATS:
+        fmt = TRACE_FORMATS[0]
+    path = os.path.expanduser(os.path.expandvars(path)) if path else ""
+    logger = get_trace_logger()
+    if (path, fmt) == _trace_config:
+        return bool(path)
+
+    _trace_config = (path, fmt)
+    _set_handlers(logger, [])
+    logger.propagate = False
+    if not path:
+        return False
+
+    from .trace import make_trace_handler
+
+    try:
+        handler = make_trace_handler(path, fmt, TRACE_FILE_SIZE, TRACE_FILE_BACKUPS)
+    except OSError as e:
+        get_logger().error("Unable to open trace file %s: %s", path, e)
+        _trace_config = ("", "")
+        return False
+
+    _set_handlers(logger, [handler])
+    logger.setLevel(logging.INFO)
+    return True
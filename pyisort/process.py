@@ -0,0 +1,168 @@
+import os
+import threading
+
+from .logger import get_logger
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import subprocess
+
+    from .typing import Any, Dict, List, Set, Tuple, Union
+
+logger = get_logger()
+
+
+class ProcessLimits:
+    """Limits applied to every isort process, from the package settings.
+
+    The memory limit caps the address space of every process in megabytes,
+    the CPU limit caps the seconds a one-off process may run on the CPU, so
+    it does not apply to the long-lived workers. Zero means no limit.
+    """
+
+    def __init__(self):
+        self.timeout = 10.0
+        self.memory = 0
+        self.cpu = 0
+
+    def update(self, timeout: float = 10, memory: int = 0, cpu: int = 0):
+        self.timeout = float(timeout) if timeout and timeout > 0 else 10.0
+        self.memory = max(int(memory or 0), 0)
+        self.cpu = max(int(cpu or 0), 0)
+
+
+limits = ProcessLimits()
+
+_live = set()  # type: Set[subprocess.Popen]
+_counts = {"started": 0, "killed": 0, "timed_out": 0}
+_lock = threading.Lock()
+
+
+def _set_limits(proc: "subprocess.Popen", memory: int, cpu: int):
+    """Apply the resource limits to a started process."""
+    import resource
+
+    try:
+        if memory:
+            size = memory * 1024 * 1024
+            resource.prlimit(proc.pid, resource.RLIMIT_AS, (size, size))
+        if cpu:
+            resource.prlimit(proc.pid, resource.RLIMIT_CPU, (cpu, cpu + 1))
+    except OSError as e:
+        logger.warning("Unable to limit isort process %s: %s", proc.pid, e)
+
+
+def _limit_cmd(cmd: "List[str]", memory: int, cpu: int) -> "List[str]":
+    """Wrap cmd in a shell which sets the limits, then replaces itself by cmd."""
+    script = ""
+    if memory:
+        script += "ulimit -v {kib} 2>/dev/null; ".format(kib=memory * 1024)
+    if cpu:
+        script += "ulimit -t {cpu} 2>/dev/null; ".format(cpu=cpu)
+    return ["/bin/sh", "-c", script + 'exec "$@"', "sh"] + list(cmd)
+
+
+def popen(cmd: "List[str]", long_lived: bool = False, **kwargs) -> "subprocess.Popen":
+    """Start a process in its own process group, with the configured limits.
+
+    The limits are not set with preexec_fn, which may deadlock the child of
+    a threaded process. Where prlimit is missing, a shell sets them and then
+    execs the command.
+    """
+    import subprocess
+
+    memory, cpu = limits.memory, 0 if long_lived else limits.cpu
+    prlimit = False
+    if os.name == "posix":
+        kwargs["start_new_session"] = True
+        if memory or cpu:
+            import resource
+
+            prlimit = hasattr(resource, "prlimit")
+            if not prlimit:
+                cmd = _limit_cmd(cmd, memory, cpu)
+    proc = subprocess.Popen(cmd, **kwargs)
+    if prlimit:
+        _set_limits(proc, memory, cpu)
+    with _lock:
+        _live.add(proc)
+        _counts["started"] += 1
+    return proc
+
+
+def kill(proc: "subprocess.Popen", timed_out: bool = False):
+    """Kill a process and everything it started, then reap it."""
+    import subprocess
+
+    if proc.poll() is None:
+        try:
+            if os.name == "posix":
+                import signal
+
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except OSError:
+            pass
+        with _lock:
+            _counts["killed"] += 1
+            if timed_out:
+                _counts["timed_out"] += 1
+
+    try:
+        proc.wait(timeout=1)
+    except subprocess.TimeoutExpired:
+        logger.warning("Unable to reap isort process %s", proc.pid)
+        return
+
+    with _lock:
+        _live.discard(proc)
+
+
+def communicate(
+    proc: "subprocess.Popen",
+    input: "Union[bytes, None]" = None,
+    timeout: "Union[float, None]" = None,
+) -> "Tuple[bytes, bytes]":
+    """Wait for a process, killing its process group when it times out."""
+    import subprocess
+
+    try:
+        stdout, stderr = proc.communicate(input=input, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        logger.warning("Kill isort process %s after %ss", proc.pid, timeout)
+        kill(proc, timed_out=True)
+        # Close the pipes, the output of a killed process is not used.
+        proc.communicate()
+        raise
+
+    with _lock:
+        _live.discard(proc)
+    return stdout, stderr
+
+
+def run(
+    cmd: "List[str]",
+    cwd: "Union[str, bytes, None]" = None,
+    input: "Union[bytes, None]" = None,
+    timeout: "Union[float, None]" = None,
+) -> "Tuple[bytes, bytes]":
+    import subprocess
+
+    proc = popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+    )
+    return communicate(proc, input, limits.timeout if timeout is None else timeout)
+
+
+def stats() -> "Dict[str, Any]":
+    """Count the processes, reaping those which exited on their own."""
+    with _lock:
+        for proc in [p for p in _live if p.poll() is not None]:
+            _live.discard(proc)
+
+        return dict(_counts, live=len(_live))
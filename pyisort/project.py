@@ -0,0 +1,389 @@
+import fnmatch
+import math
+import os
+import threading
+import time
+
+import sublime
+
+from .config import ConfigIndex, settings_path_args
+from .constants import MAX_BATCH_FILES
+from .git import (
+    GitError,
+    changed_files,
+    find_root,
+    read_blobs,
+    staged_files,
+    update_index,
+    write_blobs,
+)
+from .logger import get_logger
+from .process import limits
+from .scheduler import BATCH, get_scheduler
+from .sorted_cache import DIGEST_SIZE, get_sorted_cache, make_fingerprint
+from .timing import TRIGGER_BATCH, timings
+from .utils import get_isort_version, isort_cmd
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .timing import Job
+    from .typing import Dict, Iterator, List, Tuple, Union
+
+logger = get_logger()
+
+
+def find_python_files(
+    roots: "List[str]", exclude_patterns: "List[str]"
+) -> "Iterator[Tuple[str, List[str]]]":
+    """Yield each root with the python files found under it."""
+    for root in roots:
+        if os.path.isfile(root):
+            if root.endswith(".py"):
+                yield os.path.dirname(root), [root]
+            continue
+
+        files = []
+        for folder, dirnames, filenames in os.walk(root):
+            dirnames[:] = [
+                d
+                for d in dirnames
+                if not d.startswith(".")
+                and not any(fnmatch.fnmatch(d, p) for p in exclude_patterns)
+            ]
+            files.extend(
+                os.path.join(folder, filename)
+                for filename in filenames
+                if filename.endswith(".py")
+            )
+
+        if files:
+            yield root, sorted(files)
+
+
+def shard(paths: "List[str]", workers: int) -> "List[List[str]]":
+    """Split paths into chunks so every worker gets many paths per run."""
+    size = max(1, min(MAX_BATCH_FILES, math.ceil(len(paths) / workers)))
+    return [paths[i : i + size] for i in range(0, len(paths), size)]
+
+
+class ProjectSort:
+    """Sort every python file under some folders with parallel isort runs."""
+
+    def __init__(
+        self,
+        isort_bin: str,
+        options: "List[str]",
+        roots: "List[str]",
+        exclude_patterns: "List[str]",
+        config_index: "Union[ConfigIndex, None]" = None,
+    ):
+        self.isort_bin = isort_bin
+        self.options = options
+        self.roots = roots
+        self.exclude_patterns = exclude_patterns
+        self.config_index = config_index or ConfigIndex()
+        self.total = 0
+        self.skipped = 0
+        self.done = 0
+        self.fixed = 0
+        self.failed = 0
+        self._chunks = 0
+        self._configs = {}  # type: Dict[str, Tuple[str, str]]
+        self._cache = None
+        self._started = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._started = time.time()
+        get_scheduler().submit(self._discover, priority=BATCH)
+
+    def _config(self, path: str) -> "Tuple[str, str]":
+        """Return the config file which applies to path and its short digest."""
+        folder = os.path.dirname(path)
+        config = self._configs.get(folder)
+        if config is None:
+            config_path, digest = self.config_index.resolve(folder)
+            config = self._configs[folder] = (config_path, digest[:DIGEST_SIZE])
+
+        return config
+
+    def _discover(self):
+        sublime.status_message("Pyisort: Looking for python files...")
+        workers = get_scheduler().max_workers
+        version = get_isort_version(self.isort_bin, "spawn")
+        self._cache = get_sorted_cache(
+            make_fingerprint(self.isort_bin, version, self.options)
+        )
+        jobs = []
+        for root, paths in self._find():
+            # Skip the files which are known to be sorted already, and group
+            # the others by config since a single isort run uses one config.
+            groups = {}  # type: Dict[str, List[str]]
+            for path in paths:
+                config_path, digest = self._config(path)
+                if not self._is_sorted(path, digest):
+                    groups.setdefault(config_path, []).append(path)
+
+            unsorted = sum(len(group) for group in groups.values())
+            self.total += len(paths)
+            self.skipped += len(paths) - unsorted
+            for config_path, group in groups.items():
+                jobs.extend(
+                    (root, config_path, chunk) for chunk in shard(group, workers)
+                )
+
+        if not jobs:
+            self._finish()
+            return
+
+        self._chunks = len(jobs)
+        for root, config_path, chunk in jobs:
+            job = timings.new_job(root, TRIGGER_BATCH, files=len(chunk))
+            get_scheduler().submit(
+                self._sort_chunk, root, config_path, chunk, job, priority=BATCH
+            )
+
+    def _find(self) -> "Iterator[Tuple[str, List[str]]]":
+        return find_python_files(self.roots, self.exclude_patterns)
+
+    def _is_sorted(self, path: str, digest: str) -> bool:
+        return self._cache.is_sorted(path, digest)
+
+    def _sort_chunk(
+        self,
+        cwd: str,
+        config_path: str,
+        paths: "List[str]",
+        job: "Union[Job, None]",
+    ):
+        with timings.activate(job):
+            self._sort_files(cwd, config_path, paths)
+
+    def _sort_files(self, cwd: str, config_path: str, paths: "List[str]"):
+        import subprocess
+
+        cmd = (
+            [self.isort_bin]
+            + paths
+            + ["--filter-files"]
+            + self.options
+            + settings_path_args(config_path)
+        )
+        fixed = 0
+        failed = []
+        try:
+            # Spawn isort for every chunk so the chunks run in parallel.
+            stdout, stderr = isort_cmd(
+                cmd, cwd=cwd, runner="spawn", timeout=max(limits.timeout, len(paths))
+            )
+            fixed = stdout.count(b"Fixing ")
+            errors = stderr.decode("utf-8", "replace")
+            failed = [p for p in paths if p in errors]
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.error("Pyisort: Unable to sort %s: %s", cwd, e)
+            failed = paths
+
+        self._cache.mark_sorted(
+            (p, self._config(p)[1]) for p in paths if p not in failed
+        )
+        self._chunk_done(len(paths), fixed, len(failed))
+
+    def _chunk_done(self, done: int, fixed: int, failed: int):
+        with self._lock:
+            self.done += done
+            self.fixed += fixed
+            self.failed += failed
+            self._chunks -= 1
+            finished = self._chunks == 0
+
+        if finished:
+            self._finish()
+        else:
+            sublime.status_message(
+                "Pyisort: Sorting {done}/{total} files...".format(
+                    done=self.done + self.skipped, total=self.total
+                )
+            )
+
+    def _finish(self):
+        if not self.total:
+            sublime.status_message("Pyisort: No python files to sort.")
+            return
+
+        self._cache.compact()
+        self._cache.save()
+        msg = (
+            "Pyisort: Sorted {total} files in {seconds:.1f}s, "
+            "{fixed} fixed, {skipped} unchanged, {failed} failed."
+        ).format(
+            total=self.total,
+            seconds=time.time() - self._started,
+            fixed=self.fixed,
+            skipped=self.skipped,
+            failed=self.failed,
+        )
+        logger.info(msg)
+        sublime.status_message(msg)
+
+
+class ChangedSort(ProjectSort):
+    """Sort the python files changed in the git work trees of some folders.
+
+    Files count as changed when they differ from the commit where the
+    current branch forked from base, or when they are untracked.
+    """
+
+    def __init__(
+        self,
+        isort_bin: str,
+        options: "List[str]",
+        roots: "List[str]",
+        config_index: "Union[ConfigIndex, None]" = None,
+        base: str = "HEAD",
+    ):
+        super().__init__(isort_bin, options, roots, [], config_index)
+        self.base = base
+        # Git lists files below the real path of the work tree, while window
+        # folders may go through symlinks.
+        self._real_roots = [os.path.realpath(root) for root in roots]
+
+    def _git_roots(self) -> "List[str]":
+        git_roots = []  # type: List[str]
+        for root in self.roots:
+            folder = root if os.path.isdir(root) else os.path.dirname(root)
+            git_root = find_root(folder)
+            if not git_root:
+                logger.warning("Pyisort: %s is not in a git work tree", root)
+            elif git_root not in git_roots:
+                git_roots.append(git_root)
+
+        return git_roots
+
+    def _selected(self, path: str) -> bool:
+        """Tell whether path is one of the roots or below one of them."""
+        path = os.path.realpath(path)
+        for root in self._real_roots:
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                return True
+
+        return False
+
+    def _list(self, git_root: str) -> "List[str]":
+        return [
+            path
+            for path in changed_files(git_root, self.base)
+            if self._selected(path) and os.path.isfile(path)
+        ]
+
+    def _find(self) -> "Iterator[Tuple[str, List[str]]]":
+        for git_root in self._git_roots():
+            try:
+                paths = self._list(git_root)
+            except GitError as e:
+                logger.error("Pyisort: Unable to list files of %s: %s", git_root, e)
+                continue
+
+            if paths:
+                yield git_root, paths
+
+
+class StagedSort(ChangedSort):
+    """Sort the staged blobs of python files, leaving the work tree alone.
+
+    The sorted blobs replace the staged ones in the index once every file is
+    sorted, with a single index update per work tree. The blobs go to isort
+    through the configured runner, so a warm worker sorts them one after the
+    other without starting a process per file.
+    """
+
+    def __init__(self, *args, runner: str = "persistent", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.runner = runner
+        self._staged = {}  # type: Dict[str, Tuple[str, str]]
+        self._updates = {}  # type: Dict[str, List[Tuple[str, str, str]]]
+
+    def _list(self, git_root: str) -> "List[str]":
+        staged = staged_files(git_root)
+        self._staged.update(staged)
+        return [path for path in sorted(staged) if self._selected(path)]
+
+    def _is_sorted(self, path: str, digest: str) -> bool:
+        # The sorted cache knows the work tree, not the index.
+        return False
+
+    def _filter(
+        self, cwd: str, options: "List[str]", paths: "List[str]"
+    ) -> "List[str]":
+        """Leave out the paths which the isort config skips.
+
+        isort does not skip what it reads from stdin, so ask it which of the
+        paths it would sort.
+        """
+        cmd = [self.isort_bin, "--show-files", "--filter-files"] + options + paths
+        stdout, stderr = isort_cmd(cmd, cwd=cwd, runner=self.runner)
+        if stderr:
+            raise OSError(stderr.decode("utf-8", "replace").strip())
+
+        shown = set(
+            os.path.normpath(os.path.join(cwd, line))
+            for line in stdout.decode("utf-8", "surrogateescape").splitlines()
+            if line.strip()
+        )
+        return [path for path in paths if os.path.normpath(path) in shown]
+
+    def _sort_files(self, cwd: str, config_path: str, paths: "List[str]"):
+        import subprocess
+
+        changed = []  # type: List[Tuple[str, bytes, str]]
+        updates = []  # type: List[Tuple[str, str, str]]
+        failed = 0
+        options = self.options + settings_path_args(config_path)
+        try:
+            selected = self._filter(cwd, options, paths)
+            blobs = read_blobs(cwd, set(self._staged[p][1] for p in selected))
+        except (OSError, subprocess.TimeoutExpired, GitError) as e:
+            logger.error("Pyisort: Unable to read staged files of %s: %s", cwd, e)
+            self._chunk_done(len(paths), 0, len(paths))
+            return
+
+        for path in selected:
+            mode, blob = self._staged[path]
+            data = blobs[blob]
+            cmd = [self.isort_bin, "-", "--filename", path] + options
+            try:
+                stdout, stderr = isort_cmd(cmd, cwd=cwd, input=data, runner=self.runner)
+                if stderr or (data and not stdout):
+                    raise OSError(stderr.decode("utf-8", "replace").strip())
+                if stdout != data:
+                    changed.append((mode, stdout, path))
+            except (OSError, subprocess.TimeoutExpired) as e:
+                logger.error("Pyisort: Unable to sort staged %s: %s", path, e)
+                failed += 1
+
+        try:
+            if changed:
+                sorted_blobs = write_blobs(cwd, [data for _, data, _ in changed])
+                updates = [
+                    (mode, blob, path)
+                    for (mode, _, path), blob in zip(changed, sorted_blobs)
+                ]
+        except (OSError, GitError) as e:
+            logger.error("Pyisort: Unable to store sorted files of %s: %s", cwd, e)
+            failed += len(changed)
+
+        with self._lock:
+            self._updates.setdefault(cwd, []).extend(updates)
+        self._chunk_done(len(paths), len(updates), failed)
+
+    def _finish(self):
+        for git_root, updates in self._updates.items():
+            try:
+                update_index(git_root, updates)
+            except GitError as e:
+                logger.error(
+                    "Pyisort: Unable to update the index of %s: %s", git_root, e
+                )
+                self.fixed -= len(updates)
+                self.failed += len(updates)
+
+        super()._finish()
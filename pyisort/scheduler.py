@@ -0,0 +1,121 @@
+import itertools
+import queue
+import threading
+
+from .logger import get_logger
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from .typing import Callable, List, Union
+
+logger = get_logger()
+
+# Job priorities, lower runs first.
+INTERACTIVE = 0
+ON_SAVE = 1
+BATCH = 2
+
+
+class Scheduler:
+    """A bounded pool of threads which runs jobs in priority order."""
+
+    def __init__(self, max_workers: "Union[int, None]" = None):
+        import multiprocessing
+
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._threads = []  # type: List[threading.Thread]
+        self._idle = 0
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(
+        self, fn: "Callable", *args, priority: int = BATCH, **kwargs
+    ) -> "Future":
+        from concurrent.futures import Future
+
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Cannot schedule new jobs after shutdown")
+
+            # Jobs with the same priority run in submission order.
+            self._queue.put((priority, next(self._counter), future, fn, args, kwargs))
+            if self._idle == 0 and len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    name="pyisort-{index}".format(index=len(self._threads)),
+                    daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+            else:
+                self._idle = max(self._idle - 1, 0)
+
+        return future
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def shutdown(self, wait: bool = True, timeout: float = 1):
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+
+        # Cancel what has not started yet, then wake every thread to exit.
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if item[2] is not None:
+                item[2].cancel()
+
+        for _ in threads:
+            self._queue.put((-1, next(self._counter), None, None, (), {}))
+
+        if wait:
+            for thread in threads:
+                thread.join(timeout)
+
+    def _work(self):
+        while True:
+            _, _, future, fn, args, kwargs = self._queue.get()
+            if future is None:
+                return
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    logger.exception("Pyisort job failed")
+                    future.set_exception(e)
+
+            with self._lock:
+                self._idle += 1
+
+
+_scheduler = None  # type: Union[Scheduler, None]
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+
+        return _scheduler
+
+
+def shutdown_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        scheduler, _scheduler = _scheduler, None
+
+    if scheduler is not None:
+        scheduler.shutdown()
@@ -0,0 +1,222 @@
+import os
+import threading
+from collections import OrderedDict
+
+import sublime
+
+from .constants import (
+    PACKAGE_NAME,
+    SORTED_CACHE_FILES,
+    SORTED_CACHE_PREFIX,
+    SORTED_CACHE_SIZE,
+)
+from .logger import get_logger
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import Dict, Iterable, List, Tuple, Union
+
+logger = get_logger()
+
+# Hex digits kept from every digest, which is plenty to tell versions apart.
+DIGEST_SIZE = 16
+
+
+def file_digest(path: str) -> str:
+    import hashlib
+
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:DIGEST_SIZE]
+
+
+def get_cache_dir() -> str:
+    return os.path.join(sublime.cache_path(), PACKAGE_NAME)
+
+
+def make_fingerprint(isort_bin: str, version: str, options: "List[str]") -> str:
+    import hashlib
+    import json
+
+    data = json.dumps([isort_bin, version, options])
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:DIGEST_SIZE]
+
+
+class SortedCache:
+    """Files known to be sorted under one isort binary, version and options.
+
+    Entries map a path to its [mtime, size, content digest, config digest] and
+    persist across editor sessions in the Sublime cache directory.
+    """
+
+    def __init__(self, path: str, maxsize: int = SORTED_CACHE_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # type: OrderedDict
+        self._dirty = False
+        self._save_scheduled = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def is_sorted(self, path: str, config: str = "") -> bool:
+        with self._lock:
+            entry = self._entries.get(path)
+
+        if entry is None or entry[3] != config:
+            return False
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+
+        if st.st_size != entry[1]:
+            return False
+
+        if st.st_mtime == entry[0]:
+            return True
+
+        # Touched but maybe unchanged, so compare the contents.
+        try:
+            if file_digest(path) != entry[2]:
+                return False
+        except OSError:
+            return False
+
+        with self._lock:
+            self._entries[path] = [st.st_mtime, st.st_size, entry[2], config]
+            self._dirty = True
+
+        return True
+
+    def mark_sorted(self, items: "Iterable[Tuple[str, str]]"):
+        """Remember (path, config digest) pairs of files which are sorted."""
+        entries = []
+        for path, config in items:
+            try:
+                st = os.stat(path)
+                digest = file_digest(path)
+            except OSError:
+                continue
+
+            entries.append((path, [st.st_mtime, st.st_size, digest, config]))
+
+        with self._lock:
+            for path, entry in entries:
+                self._entries.pop(path, None)
+                self._entries[path] = entry
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+            self._dirty = True
+
+    def compact(self):
+        """Drop the entries of files which were deleted or changed since."""
+        with self._lock:
+            entries = list(self._entries.items())
+
+        stale = []
+        for path, entry in entries:
+            try:
+                st = os.stat(path)
+            except OSError:
+                stale.append(path)
+                continue
+
+            if st.st_size != entry[1] or st.st_mtime != entry[0]:
+                stale.append(path)
+
+        with self._lock:
+            for path in stale:
+                self._entries.pop(path, None)
+
+            self._dirty = self._dirty or bool(stale)
+
+    def save(self):
+        import json
+
+        with self._lock:
+            if not self._dirty:
+                return
+
+            data = json.dumps(self._entries, separators=(",", ":"))
+            self._dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = "{path}.tmp".format(path=self.path)
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning("Unable to write sorted cache: %s", e)
+
+    def schedule_save(self, delay: int = 2000):
+        """Save once after a burst of updates."""
+
+        def _save():
+            self._save_scheduled = False
+            self.save()
+
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            sublime.set_timeout_async(_save, delay)
+
+    def _load(self):
+        import json
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        self._entries.update(
+            (k, v) for k, v in entries.items() if isinstance(v, list) and len(v) == 4
+        )
+
+
+_caches = {}  # type: Dict[str, SortedCache]
+_caches_lock = threading.Lock()
+
+
+def get_sorted_cache(fingerprint: str) -> SortedCache:
+    with _caches_lock:
+        cache = _caches.get(fingerprint)
+        if cache is None:
+            path = os.path.join(
+                get_cache_dir(),
+                "{prefix}{fingerprint}.json".format(
+                    prefix=SORTED_CACHE_PREFIX, fingerprint=fingerprint
+                ),
+            )
+            cache = _caches[fingerprint] = SortedCache(path)
+            evict_sorted_caches(keep=path)
+
+    return cache
+
+
+def evict_sorted_caches(keep: "Union[str, None]" = None):
+    """Remove the oldest cache files beyond the number that is kept around."""
+    folder = get_cache_dir()
+    try:
+        names = [n for n in os.listdir(folder) if n.startswith(SORTED_CACHE_PREFIX)]
+    except OSError:
+        return
+
+    paths = [os.path.join(folder, n) for n in names]
+    paths = [p for p in paths if p != keep]
+    paths.sort(key=lambda p: os.path.getmtime(p), reverse=True)
+    for path in paths[SORTED_CACHE_FILES - 1 :]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def save_sorted_caches():
+    with _caches_lock:
+        caches = list(_caches.values())
+
+    for cache in caches:
+        cache.save()
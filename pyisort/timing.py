@@ -0,0 +1,226 @@
+import itertools
+import threading
+import time
+from collections import deque
+
+from .constants import TIMING_BUCKETS, TIMING_SAMPLES
+from .logger import get_trace_logger
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import Any, Dict, List, Tuple, Union
+
+# Phases of a sort in the order they happen.
+PHASES = ("settings", "options", "encoding", "spawn", "isort", "decode", "replace")
+
+# What started a job.
+TRIGGER_INTERACTIVE = "interactive"
+TRIGGER_ON_SAVE = "on-save"
+TRIGGER_BATCH = "batch"
+TRIGGER_LINT = "lint"
+
+_job_ids = itertools.count(1)
+# The job whose spans are collected on the current thread.
+_local = threading.local()
+
+
+class Job:
+    """The trace record of a single sort, from its request until it is done."""
+
+    def __init__(self, file: str, trigger: str, **fields):
+        self.id = next(_job_ids)
+        self.file = file
+        self.trigger = trigger
+        self.created = time.time()
+        self.fields = fields  # type: Dict[str, Any]
+        self.spans = []  # type: List[Tuple[str, float, float]]
+        self.thread = 0
+        self.queue_wait = 0.0
+        self.total = 0.0
+        self._created = time.perf_counter()
+
+    def record(self, phase: str, start: float, seconds: float):
+        self.spans.append((phase, start - self._created, seconds))
+
+    def as_dict(self) -> "Dict[str, Any]":
+        phases = {}  # type: Dict[str, float]
+        for phase, _, seconds in self.spans:
+            phases[phase] = phases.get(phase, 0.0) + seconds
+
+        record = {
+            "job": self.id,
+            "file": self.file,
+            "trigger": self.trigger,
+            "ts": round(self.created, 6),
+            "queue_wait_ms": round(self.queue_wait * 1000, 3),
+            "spawn_ms": round(phases.get("spawn", 0.0) * 1000, 3),
+            "isort_ms": round(phases.get("isort", 0.0) * 1000, 3),
+            "total_ms": round(self.total * 1000, 3),
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "cache_hit": False,
+        }
+        record.update(self.fields)
+        return record
+
+
+class _NullSpan:
+    """Handed out while nothing is recorded, so a span costs next to nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, timings: "Timings", phase: str, job: "Union[Job, None]"):
+        self.timings = timings
+        self.phase = phase
+        self.job = job
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        if self.timings.enabled:
+            self.timings.record(self.phase, seconds)
+        if self.job is not None:
+            self.job.record(self.phase, self.start, seconds)
+        return False
+
+
+class _Activation:
+    def __init__(self, job: Job):
+        self.job = job
+
+    def __enter__(self):
+        job = self.job
+        job.spans = []
+        job.thread = threading.get_ident()
+        job.queue_wait = time.perf_counter() - job._created
+        _local.job = job
+        return job
+
+    def __exit__(self, *exc_info):
+        _local.job = None
+        job = self.job
+        job.total = time.perf_counter() - job._created
+        get_trace_logger().info("%s job %d", job.trigger, job.id, extra={"job": job})
+        return False
+
+
+class Timings:
+    """Ring buffers of the latest durations of every phase of a sort."""
+
+    def __init__(self, maxlen: int = TIMING_SAMPLES):
+        self.enabled = False
+        self.tracing = False
+        self.maxlen = maxlen
+        self._samples = {}  # type: Dict[str, deque]
+        self._lock = threading.Lock()
+
+    def span(self, phase: str):
+        job = getattr(_local, "job", None)
+        if not self.enabled and job is None:
+            return _NULL_SPAN
+
+        return _Span(self, phase, job)
+
+    def new_job(self, file: str, trigger: str, **fields) -> "Union[Job, None]":
+        """Start the trace record of a job, or return None while not tracing."""
+        return Job(file, trigger, **fields) if self.tracing else None
+
+    def activate(self, job: "Union[Job, None]"):
+        """Collect the spans of the current thread into job, then trace it."""
+        if job is None:
+            return _NULL_SPAN
+
+        return _Activation(job)
+
+    def annotate(self, **fields):
+        """Add fields to the trace record of the job of the current thread."""
+        job = getattr(_local, "job", None)
+        if job is not None:
+            job.fields.update(fields)
+
+    def record(self, phase: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(phase)
+            if samples is None:
+                samples = self._samples[phase] = deque(maxlen=self.maxlen)
+
+            samples.append(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def histograms(self) -> "Dict[str, Dict[str, Any]]":
+        """Percentiles and bucket counts in milliseconds per phase."""
+        with self._lock:
+            snapshot = {phase: list(s) for phase, s in self._samples.items()}
+
+        result = {}
+        for phase, samples in snapshot.items():
+            ms = sorted(s * 1000 for s in samples)
+            buckets = [0] * (len(TIMING_BUCKETS) + 1)
+            for value in ms:
+                index = 0
+                while index < len(TIMING_BUCKETS) and value >= TIMING_BUCKETS[index]:
+                    index += 1
+                buckets[index] += 1
+
+            result[phase] = {
+                "count": len(ms),
+                "p50": _percentile(ms, 50),
+                "p95": _percentile(ms, 95),
+                "max": ms[-1],
+                "buckets": buckets,
+            }
+
+        return result
+
+    def report(self) -> str:
+        histograms = self.histograms()
+        if not histograms:
+            return "No timings recorded yet."
+
+        labels = ["< {ms:g} ms".format(ms=ms) for ms in TIMING_BUCKETS]
+        labels.append(">= {ms:g} ms".format(ms=TIMING_BUCKETS[-1]))
+        width = max(len(label) for label in labels)
+        phases = [p for p in PHASES if p in histograms]
+        phases += sorted(set(histograms) - set(PHASES))
+        lines = []  # type: List[str]
+        for phase in phases:
+            hist = histograms[phase]
+            lines.append(
+                "{phase}: {count} samples, p50 {p50:.2f} ms, p95 {p95:.2f} ms, "
+                "max {max:.2f} ms".format(phase=phase, **hist)
+            )
+            peak = max(hist["buckets"])
+            for label, count in zip(labels, hist["buckets"]):
+                if count:
+                    bar = "#" * max(1, count * 40 // peak)
+                    lines.append(
+                        "  {label:>{width}} {count:>6} {bar}".format(
+                            label=label, width=width, count=count, bar=bar
+                        )
+                    )
+            lines.append("")
+
+        return "\n".join(lines)
+
+
+def _percentile(ordered: "List[float]", pct: int) -> float:
+    index = int(round(pct / 100.0 * len(ordered))) - 1
+    return ordered[max(0, min(len(ordered) - 1, index))]
+
+
+timings = Timings()
@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+from logging.handlers import RotatingFileHandler
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .timing import Job
+    from .typing import Any, Dict, Union
+
+
+class JsonlFormatter(logging.Formatter):
+    """Format a job record as a single line of JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.job.as_dict(), sort_keys=True)
+
+
+class ChromeTraceFormatter(logging.Formatter):
+    """Format a job record as complete events of the Chrome trace format.
+
+    The job and each of its phases become one event, the time spent queued
+    is shown as a "queue" phase in front of the others.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        job = record.job  # type: Job
+        args = job.as_dict()
+        start = job.created * 1e6
+        events = [
+            self._event(job, job.trigger, "job", start, job.total * 1e6, args),
+            self._event(job, "queue", "phase", start, job.queue_wait * 1e6),
+        ]
+        for phase, offset, seconds in job.spans:
+            events.append(
+                self._event(job, phase, "phase", start + offset * 1e6, seconds * 1e6)
+            )
+
+        return ",\n".join(json.dumps(event, sort_keys=True) for event in events) + ","
+
+    @staticmethod
+    def _event(
+        job: "Job",
+        name: str,
+        category: str,
+        ts: float,
+        dur: float,
+        args: "Union[Dict[str, Any], None]" = None,
+    ) -> "Dict[str, Any]":
+        return {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round(ts, 1),
+            "dur": round(dur, 1),
+            "pid": os.getpid(),
+            "tid": job.thread,
+            "args": args or {},
+        }
+
+
+class ChromeTraceHandler(RotatingFileHandler):
+    """Write every file as an unterminated JSON array, which viewers accept."""
+
+    def _open(self):
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write("[\n")
+        return stream
+
+
+def make_trace_handler(
+    path: str, fmt: str, max_bytes: int, backup_count: int
+) -> logging.Handler:
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    if fmt == "chrome":
+        handler = ChromeTraceHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )  # type: RotatingFileHandler
+        handler.setFormatter(ChromeTraceFormatter())
+    else:
+        handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        handler.setFormatter(JsonlFormatter())
+
+    return handler
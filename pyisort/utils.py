@@ -1,106 +1,296 @@
-import json
-import pathlib
-import subprocess
-from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
 
 import sublime
 
+from .config import ConfigIndex
 from .constants import (
     DEFAULT_ENCODING,
     PACKAGE_NAME,
     PREFERENCE_FILE_NAME,
     SETTINGS_FILE_NAME,
+    SETTINGS_KEYS,
     UNDEFINED_ENCODING,
 )
-from .logger import get_logger
+from .logger import configure_trace, get_logger
 from .options import SETTING_OPTIONS_COMMANDS_MAPPING
-from .typing import Any, Dict, List, Tuple, Union
+from .process import communicate, limits, popen, run
+from .scheduler import BATCH, get_scheduler
+from .timing import timings
+from .worker import WorkerError, get_worker
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import Any, Dict, List, Tuple, Union
 
 logger = get_logger()
 
+# Merged settings and compiled isort options per window id.
+_settings_cache = {}  # type: Dict[Union[int, None], Dict[str, Any]]
+
 
 def get_preference_settings() -> sublime.Settings:
     settings = sublime.load_settings(PREFERENCE_FILE_NAME)
     return settings
 
 
+def get_folder_exclude_patterns(window: sublime.Window) -> "List[str]":
+    """Return the global folder excludes and those of every project folder."""
+    patterns = list(get_preference_settings().get("folder_exclude_patterns", []))
+    for folder in (window.project_data() or {}).get("folders", []):
+        patterns.extend(
+            p for p in folder.get("folder_exclude_patterns", []) if p not in patterns
+        )
+    return patterns
+
+
 def get_package_settings() -> sublime.Settings:
     settings = sublime.load_settings(SETTINGS_FILE_NAME)
     logger.debug("Get sublime package settings")
     return settings
 
 
-def get_project_settings(view: sublime.View) -> Dict[str, Any]:
-    window = view.window()
+def get_window(
+    view: "Union[sublime.View, sublime.Window]",
+) -> "Union[sublime.Window, None]":
+    return view if isinstance(view, sublime.Window) else view.window()
+
+
+def get_project_settings(
+    view: "Union[sublime.View, sublime.Window]",
+) -> "Dict[str, Any]":
+    window = get_window(view)
     if not window:
         return {}
 
     settings = (window.project_data() or {}).get("settings", {}).get(PACKAGE_NAME, {})
-    logger.debug(
-        "Get sublime project settings: {settings}".format(settings=json.dumps(settings))
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        import json
+
+        logger.debug("Get sublime project settings: %s", json.dumps(settings))
     return settings
 
 
-def load_settings(view: sublime.View) -> Dict[str, Any]:
+def clear_settings_cache(window: "Union[sublime.Window, None]" = None):
+    if window is None:
+        _settings_cache.clear()
+    else:
+        _settings_cache.pop(window.id(), None)
+
+
+def watch_settings():
+    get_package_settings().add_on_change(PACKAGE_NAME, _on_package_settings_change)
+    _on_package_settings_change()
+
+
+def _on_package_settings_change():
+    clear_settings_cache()
+    # Timing is process wide, so it only follows the package settings.
+    settings = get_package_settings()
+    timings.enabled = bool(settings.get("isort_timing", False))
+    timings.tracing = configure_trace(
+        settings.get("isort_trace_file", ""),
+        settings.get("isort_trace_format", "jsonl"),
+    )
+    limits.update(
+        settings.get("isort_timeout", 10),
+        settings.get("isort_memory_limit", 0),
+        settings.get("isort_cpu_limit", 0),
+    )
+
+
+def unwatch_settings():
+    get_package_settings().clear_on_change(PACKAGE_NAME)
+    clear_settings_cache()
+    timings.tracing = configure_trace()
+
+
+def _get_settings_entry(
+    view: "Union[sublime.View, sublime.Window]",
+) -> "Dict[str, Any]":
+    window = get_window(view)
+    key = window.id() if window else None
+    entry = _settings_cache.get(key)
+    if entry is None:
+        entry = _settings_cache[key] = {"settings": _merge_settings(view)}
+
+    return entry
+
+
+def _merge_settings(view: "Union[sublime.View, sublime.Window]") -> "Dict[str, Any]":
     package_settings = get_package_settings()
     project_settings = get_project_settings(view)
     settings = {
-        k: package_settings.get(k) for k in project_settings if package_settings.has(k)
+        k: package_settings.get(k)
+        for k in set(SETTINGS_KEYS).union(project_settings)
+        if package_settings.has(k)
     }
     settings.update(project_settings)
-    logger.debug(
-        "Load sublime settings finally: {settings}".format(
-            settings=json.dumps(settings)
-        )
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        import json
+
+        logger.debug("Load sublime settings finally: %s", json.dumps(settings))
     return settings
 
 
+def load_settings(view: "Union[sublime.View, sublime.Window]") -> "Dict[str, Any]":
+    return _get_settings_entry(view)["settings"]
+
+
 def proc_cmd_in_background(
-    cmd, success_msg: Union[str, None] = None, encoding: str = DEFAULT_ENCODING
+    cmd, success_msg: "Union[str, None]" = None, encoding: str = DEFAULT_ENCODING
 ):
     def _callback(future):
         if future.exception() is not None:
             sublime.message_dialog(str(future.exception()))
         else:
             stdout, stderr = future.result()
-            logger.debug(stdout.decode(encoding))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s", stdout.decode(encoding))
             if success_msg:
                 sublime.message_dialog(success_msg)
 
-    def _process(cmd):
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = proc.communicate(timeout=10)
-        return stdout, stderr
-
-    executor = ThreadPoolExecutor(max_workers=5)
-    f = executor.submit(_process, cmd)
+    f = get_scheduler().submit(run, cmd, priority=BATCH)
     f.add_done_callback(_callback)
-    executor.shutdown(wait=False)
 
 
 def proc_cmd(
-    cmd: List[str],
-    cwd: Union[str, bytes, None] = None,
-    input: Union[bytes, None] = None,
-) -> Tuple[bytes, bytes]:
-    proc = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        cwd=cwd,
+    cmd: "List[str]",
+    cwd: "Union[str, bytes, None]" = None,
+    input: "Union[bytes, None]" = None,
+    timeout: "Union[float, None]" = None,
+) -> "Tuple[bytes, bytes]":
+    """Run a command, killing it and its children if it runs past timeout."""
+    import subprocess
+
+    with timings.span("spawn"):
+        proc = popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+        )
+    with timings.span("isort"):
+        return communicate(proc, input, limits.timeout if timeout is None else timeout)
+
+
+def isort_cmd(
+    cmd: "List[str]",
+    cwd: "Union[str, bytes, None]" = None,
+    input: "Union[bytes, None]" = None,
+    encoding: str = DEFAULT_ENCODING,
+    runner: str = "persistent",
+    timeout: "Union[float, None]" = None,
+) -> "Tuple[bytes, bytes]":
+    """Run an isort command line, preferring a warm worker over a fresh spawn.
+
+    Only a worker which crashes or cannot start falls back to a spawn; a sort
+    which runs past the timeout raises subprocess.TimeoutExpired either way.
+    """
+    if timeout is None:
+        timeout = limits.timeout
+    if runner in ("persistent", "fork_server"):
+        worker = get_worker(cmd[0], fork=runner == "fork_server")
+        if worker:
+            try:
+                with timings.span("isort"):
+                    return worker.request(
+                        cmd[1:],
+                        cwd=cwd,
+                        input=input,
+                        encoding=encoding,
+                        timeout=timeout,
+                    )
+            except WorkerError as e:
+                logger.warning("Fall back to spawn isort: %s", e)
+
+    return proc_cmd(cmd, cwd=cwd, input=input, timeout=timeout)
+
+
+# The version every spawned isort binary printed.
+_spawn_versions = {}  # type: Dict[str, str]
+
+
+def _spawn_isort_version(isort_bin: str) -> str:
+    import subprocess
+
+    version = _spawn_versions.get(isort_bin)
+    if version is not None:
+        return version
+
+    try:
+        stdout, _ = proc_cmd([isort_bin, "--version-number"])
+    except (OSError, subprocess.TimeoutExpired):
+        version = ""
+    else:
+        version = stdout.decode(DEFAULT_ENCODING).strip()
+
+    _spawn_versions[isort_bin] = version
+    return version
+
+
+def get_isort_version(isort_bin: str, runner: str = "persistent") -> str:
+    if runner in ("persistent", "fork_server"):
+        worker = get_worker(isort_bin, fork=runner == "fork_server")
+        if worker and worker.version:
+            return worker.version
+
+    return _spawn_isort_version(isort_bin)
+
+
+def isort_is_warm(isort_bin: str, runner: str = "persistent") -> bool:
+    """Tell whether a sort can start without waiting for isort to start up.
+
+    That is when the worker of the runner is running, or for a spawned isort
+    when its version is known.
+    """
+    if runner in ("persistent", "fork_server"):
+        worker = get_worker(isort_bin, fork=runner == "fork_server")
+        if worker:
+            return worker.alive() and bool(worker.version)
+
+    return isort_bin in _spawn_versions
+
+
+def get_config_index(view: "Union[sublime.View, sublime.Window]") -> ConfigIndex:
+    """Return the isort config index of the window of a view."""
+    entry = _get_settings_entry(view)
+    if "configs" not in entry:
+        entry["configs"] = ConfigIndex()
+
+    return entry["configs"]
+
+
+def result_cache_key(
+    cmd: "List[str]",
+    config: str,
+    input: bytes,
+    encoding: str,
+    runner: str = "persistent",
+) -> "Tuple":
+    """Key an isort result by its input, command, isort and config digest."""
+    import hashlib
+
+    return (
+        hashlib.sha1(input).hexdigest(),
+        tuple(cmd),
+        get_isort_version(cmd[0], runner),
+        config,
+        encoding,
     )
-    stdout, stderr = proc.communicate(input=input, timeout=10)
-    return stdout, stderr
 
 
-def get_isort_bin(view: sublime.View) -> Union[str, None]:
+def get_isort_bin(view: "Union[sublime.View, sublime.Window]") -> "Union[str, None]":
     settings = load_settings(view)
     isort_bin = settings.get("isort_bin")
     if isort_bin:
-        return pathlib.Path(isort_bin).as_posix()
+        return isort_bin.replace(os.sep, "/")
+
+
+def get_runner(view: "Union[sublime.View, sublime.Window]") -> str:
+    settings = load_settings(view)
+    return settings.get("isort_runner") or "persistent"
 
 
 def is_python_syntax(view: sublime.View) -> bool:
@@ -109,16 +299,23 @@ def is_python_syntax(view: sublime.View) -> bool:
 
 def get_encoding(view: sublime.View) -> str:
     encoding = view.encoding()
-    logger.debug("View encoding: {encoding}".format(encoding=encoding))
+    logger.debug("View encoding: %s", encoding)
     if encoding == UNDEFINED_ENCODING:
         encoding = get_preference_settings().get("default_encoding", "")
-        logger.debug("Preferences encoding: {encoding}".format(encoding=encoding))
+        logger.debug("Preferences encoding: %s", encoding)
 
     return encoding
 
 
-def get_options(view: sublime.View):
-    settings = load_settings(view)
+def get_options(view: "Union[sublime.View, sublime.Window]"):
+    entry = _get_settings_entry(view)
+    if "options" not in entry:
+        entry["options"] = _compile_options(entry["settings"])
+
+    return list(entry["options"])
+
+
+def _compile_options(settings: "Dict[str, Any]") -> "List[str]":
     options = []
     for name, value in settings.get("options", {}).items():
         option = SETTING_OPTIONS_COMMANDS_MAPPING[name]
@@ -0,0 +1,375 @@
+import functools
+import logging
+import os
+import re
+import shlex
+import shutil
+import threading
+
+from .constants import DEFAULT_ENCODING
+from .logger import get_logger
+from .process import kill, limits, popen
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .typing import Dict, List, Tuple, Union
+
+logger = get_logger()
+
+# The server runs inside the interpreter that owns the isort binary, so it can
+# import isort once and keep it warm between requests. Every request is a JSON
+# header line followed by the raw payload bytes, and every response mirrors
+# that framing with the captured stdout and stderr. Started with a "fork"
+# argument, it sorts every request in a forked child instead, so no state is
+# carried from one sort to the next.
+_SERVER_SOURCE = r"""
+import io
+import json
+import os
+import sys
+import traceback
+
+channel_in = sys.stdin.buffer
+channel_out = sys.stdout.buffer
+sys.stdout = sys.stderr
+
+
+def reply(header, *payloads):
+    channel_out.write(json.dumps(header).encode("utf-8") + b"\n")
+    for payload in payloads:
+        channel_out.write(payload)
+    channel_out.flush()
+
+
+def read_exact(size):
+    chunks = []
+    while size > 0:
+        chunk = channel_in.read(size)
+        if not chunk:
+            raise EOFError
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def sort(isort, header, data, home):
+    encoding = header.get("encoding") or "utf-8"
+    out, err = io.BytesIO(), io.BytesIO()
+    out_stream = io.TextIOWrapper(out, encoding=encoding, newline="")
+    err_stream = io.TextIOWrapper(err, encoding=encoding, newline="")
+    in_stream = io.TextIOWrapper(io.BytesIO(data), encoding=encoding, newline="")
+    sys.stdout, sys.stderr = out_stream, err_stream
+    try:
+        os.chdir(header.get("cwd") or home)
+        isort.main.main(header["argv"], stdin=in_stream)
+    except SystemExit:
+        pass
+    except Exception:
+        traceback.print_exc(file=err_stream)
+    finally:
+        out_stream.flush()
+        err_stream.flush()
+        sys.stdout, sys.stderr = sys.__stderr__, sys.__stderr__
+        os.chdir(home)
+
+    return out.getvalue(), err.getvalue()
+
+
+def sort_in_child(isort, header, data, home):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 1
+        try:
+            stdout, stderr = sort(isort, header, data, home)
+            with os.fdopen(write_fd, "wb") as f:
+                f.write(json.dumps([len(stdout), len(stderr)]).encode("utf-8"))
+                f.write(b"\n" + stdout + stderr)
+            status = 0
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        result = f.read()
+    _, status = os.waitpid(pid, 0)
+    head, _, body = result.partition(b"\n")
+    if status or not head:
+        return b"", "isort child exited with status {0}".format(status).encode()
+
+    out_size, err_size = json.loads(head.decode("utf-8"))
+    return body[:out_size], body[out_size : out_size + err_size]
+
+
+def serve(fork):
+    try:
+        import isort
+        import isort.main
+
+        if fork:
+            # Load what isort imports lazily once, rather than in every child.
+            isort.code("import os\n")
+    except Exception as e:
+        reply({"ready": False, "error": str(e)})
+        return
+
+    reply({"ready": True, "version": getattr(isort, "__version__", "")})
+    home = os.getcwd()
+    while True:
+        line = channel_in.readline()
+        if not line:
+            return
+
+        header = json.loads(line.decode("utf-8"))
+        data = read_exact(header["size"])
+        if fork:
+            stdout, stderr = sort_in_child(isort, header, data, home)
+        else:
+            stdout, stderr = sort(isort, header, data, home)
+        reply({"stdout": len(stdout), "stderr": len(stderr)}, stdout, stderr)
+
+
+serve(sys.argv[1:] == ["fork"])
+"""
+
+
+PYTHON_RE = re.compile(r"^(python|pypy)[0-9.]*[dmu]*(\.exe)?$", re.I)
+# The second line of the launcher pip writes when the shebang would be too long.
+EXEC_LAUNCHER_RE = re.compile(rb"^'''exec' (.+) \"\$0\" \"\$@\"")
+
+
+class WorkerError(Exception):
+    """An isort worker failed to answer a request."""
+
+
+def is_python(path: str) -> bool:
+    """Tell by its name whether an executable is a python interpreter."""
+    return PYTHON_RE.match(os.path.basename(path)) is not None
+
+
+@functools.lru_cache(maxsize=32)
+def find_interpreter(isort_bin: str) -> "Union[Tuple[str, ...], None]":
+    """Find the python command that runs the given isort binary.
+
+    Returns None for scripts run by anything but python, like pyenv shims and
+    other shell wrappers, which can only be spawned.
+    """
+    path = shutil.which(isort_bin)
+    if not path:
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            first_line = f.readline(512)
+            second_line = f.readline(512)
+    except OSError:
+        return None
+
+    if first_line.startswith(b"#!"):
+        match = EXEC_LAUNCHER_RE.match(second_line)
+        line = match.group(1) if match else first_line[2:]
+        try:
+            parts = shlex.split(line.decode(DEFAULT_ENCODING).strip())
+        except ValueError:
+            return None
+
+        if parts and os.path.basename(parts[0]) == "env":
+            parts = [p for p in parts[1:] if not p.startswith("-")]
+        if not parts or not is_python(parts[0]):
+            return None
+
+        interpreter = shutil.which(parts[0])
+        return (interpreter,) + tuple(parts[1:]) if interpreter else None
+
+    # Console script launchers on Windows live in Scripts next to python.exe.
+    folder = os.path.dirname(path)
+    for candidate in (folder, os.path.dirname(folder)):
+        for name in ("python.exe", "python3", "python"):
+            interpreter = os.path.join(candidate, name)
+            if os.path.isfile(interpreter):
+                return (interpreter,)
+
+
+class IsortWorker:
+    """A long-lived isort process that keeps isort imported between sorts.
+
+    With fork set, the process forks a child with isort already imported for
+    every sort rather than sorting in itself.
+    """
+
+    def __init__(
+        self, isort_bin: str, interpreter: "Tuple[str, ...]", fork: bool = False
+    ):
+        self.isort_bin = isort_bin
+        self.interpreter = interpreter
+        self.fork = fork
+        self.version = ""
+        self.broken = False
+        self.started = False
+        self._proc = None
+        self._lock = threading.Lock()
+
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self, timeout: "Union[float, None]" = None):
+        import subprocess
+
+        self.stop()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Start isort worker: %s", " ".join(self.interpreter))
+        # A worker which never started will not start on the next request
+        # either, while one which ran before may only have crashed.
+        try:
+            self._proc = popen(
+                list(self.interpreter)
+                + ["-u", "-c", _SERVER_SOURCE]
+                + (["fork"] if self.fork else []),
+                long_lived=True,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            header = self._read_header(limits.timeout if timeout is None else timeout)
+        except (OSError, WorkerError, subprocess.TimeoutExpired) as e:
+            self.broken = not self.started
+            self.stop()
+            raise WorkerError("Unable to start isort worker: {error}".format(error=e))
+
+        if not header.get("ready"):
+            self.broken = True
+            self.stop()
+            raise WorkerError(
+                "Unable to import isort: {error}".format(error=header.get("error"))
+            )
+
+        self.started = True
+        self.version = header.get("version", "")
+
+    def stop(self):
+        import subprocess
+
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+
+        try:
+            proc.stdin.close()
+            # The server exits by itself once its input is closed.
+            proc.wait(timeout=0.2)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        kill(proc)
+
+    def request(
+        self,
+        argv: "List[str]",
+        cwd: "Union[str, bytes, None]" = None,
+        input: "Union[bytes, None]" = None,
+        encoding: str = DEFAULT_ENCODING,
+        timeout: "Union[float, None]" = None,
+    ) -> "Tuple[bytes, bytes]":
+        import json
+
+        if timeout is None:
+            timeout = limits.timeout
+        if isinstance(cwd, bytes):
+            cwd = os.fsdecode(cwd)
+        data = input or b""
+        header = {"argv": argv, "cwd": cwd, "encoding": encoding, "size": len(data)}
+        payload = json.dumps(header).encode("utf-8") + b"\n" + data
+        with self._lock:
+            # A worker that died between requests is restarted once, a worker
+            # that dies while sorting is reported so the caller can fall back.
+            if not self.alive():
+                self.start(timeout)
+            try:
+                self._send(payload)
+            except OSError:
+                self.start(timeout)
+                self._send(payload)
+
+            response = self._read_header(timeout)
+            stdout = self._proc.stdout.read(response["stdout"])
+            stderr = self._proc.stdout.read(response["stderr"])
+            # A worker which dies while replying leaves the output cut short,
+            # which would read like a sort that dropped imports.
+            if len(stdout) != response["stdout"] or len(stderr) != response["stderr"]:
+                self.stop()
+                raise WorkerError("isort worker sent a truncated response")
+
+            return stdout, stderr
+
+    def _send(self, payload: bytes):
+        self._proc.stdin.write(payload)
+        self._proc.stdin.flush()
+
+    def _read_header(self, timeout: float) -> "Dict":
+        """Read the next header, killing the worker when it runs past timeout.
+
+        A timeout raises subprocess.TimeoutExpired like a spawned isort does,
+        so the caller does not run the same sort again in a fresh process.
+        """
+        import json
+        import subprocess
+
+        proc = self._proc
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            kill(proc, timed_out=True)
+
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+        try:
+            line = proc.stdout.readline()
+        finally:
+            timer.cancel()
+
+        if not line:
+            self.stop()
+            if expired.is_set():
+                raise subprocess.TimeoutExpired(list(self.interpreter), timeout)
+
+            raise WorkerError("isort worker exited unexpectedly")
+
+        try:
+            return json.loads(line.decode("utf-8"))
+        except ValueError:
+            self.stop()
+            raise WorkerError("isort worker sent a malformed response")
+
+
+_workers = {}  # type: Dict[Tuple[str, Tuple[str, ...], bool], IsortWorker]
+_workers_lock = threading.Lock()
+
+
+def get_worker(isort_bin: str, fork: bool = False) -> "Union[IsortWorker, None]":
+    """Return the shared worker for an isort binary, or None if unavailable."""
+    if fork and not hasattr(os, "fork"):
+        return None
+
+    interpreter = find_interpreter(isort_bin)
+    if not interpreter:
+        return None
+
+    key = (isort_bin, interpreter, fork)
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None:
+            worker = _workers[key] = IsortWorker(isort_bin, interpreter, fork)
+
+    return None if worker.broken else worker
+
+
+def shutdown_workers():
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+
+    for worker in workers:
+        worker.stop()
+
+    find_interpreter.cache_clear()
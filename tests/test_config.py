@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyisort.config import ConfigIndex, _scan_toml, has_isort_config
+
+PYPROJECTS = [
+    ('[tool.isort]  # comment\nprofile = "black"\n', True),
+    ('[tool]\nisort.profile = "black"\n', True),
+    ('tool.isort.profile = "black"\n', True),
+    ('[tool]\nisort = { profile = "black" }\n', True),
+    ('[ tool . "isort" ]\nprofile = "black"\n', True),
+    ("[tool.isort]\n\n[tool.black]\nline-length = 88\n", False),
+    ("[tool]\nisort = {}\n", False),
+    ("[tool.black]\nline-length = 88\n", False),
+]
+
+
+class HasIsortConfigTest(unittest.TestCase):
+    def test_pyproject(self):
+        for text, expected in PYPROJECTS:
+            with self.subTest(text=text):
+                self.assertIs(has_isort_config("pyproject.toml", text), expected)
+
+    def test_pyproject_without_toml_parser(self):
+        for text, expected in PYPROJECTS:
+            with self.subTest(text=text):
+                self.assertIs(_scan_toml(text), expected)
+
+    def test_invalid_pyproject(self):
+        self.assertFalse(has_isort_config("pyproject.toml", "[tool.isort\nx = 1\n"))
+
+    def test_ini_sections(self):
+        self.assertTrue(has_isort_config("setup.cfg", "[isort]  \nprofile = black\n"))
+        self.assertTrue(has_isort_config("tox.ini", "[tool:isort]\nprofile=black\n"))
+        self.assertTrue(has_isort_config(".isort.cfg", "[settings]\nprofile=black\n"))
+        self.assertFalse(has_isort_config("setup.cfg", "[flake8]\nmax = 1\n"))
+        self.assertFalse(has_isort_config("setup.cfg", "[isort]\n"))
+
+    def test_ini_isort_fails_to_read(self):
+        self.assertFalse(has_isort_config(".isort.cfg", "[settings]\nx = %(bad\n"))
+
+    def test_editorconfig(self):
+        text = "root = true\n\n[*.{py,pyi}]\nprofile = black\n"
+        self.assertTrue(has_isort_config(".editorconfig", text))
+        text = "root = true\n\n[*.md]\nindent_size = 2\n"
+        self.assertFalse(has_isort_config(".editorconfig", text))
+
+
+class ConfigIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        os.mkdir(os.path.join(self.root, ".git"))
+        self.folder = os.path.join(self.root, "pkg")
+        os.mkdir(self.folder)
+
+    def write(self, folder, name, text):
+        path = os.path.join(folder, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_nearest_isort_config(self):
+        self.write(self.root, "setup.cfg", "[isort]\nprofile = black\n")
+        path = self.write(self.folder, "pyproject.toml", "[tool]\nisort.profile = 1\n")
+        config, digest = ConfigIndex().resolve(self.folder)
+        self.assertEqual(config, path)
+        self.assertTrue(digest)
+
+    def test_skips_configs_without_isort(self):
+        self.write(self.folder, "pyproject.toml", "[tool.black]\nline-length = 88\n")
+        path = self.write(self.root, "setup.cfg", "[isort]\nprofile = black\n")
+        self.assertEqual(ConfigIndex().resolve(self.folder)[0], path)
+
+    def test_stops_at_repository_root(self):
+        self.assertEqual(ConfigIndex().resolve(self.folder), ("", ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
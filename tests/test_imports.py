@@ -0,0 +1,59 @@
+import unittest
+
+from pyisort.imports import find_import_head
+
+
+def head(text):
+    end = find_import_head(text)
+    return None if end is None else text[:end]
+
+
+class FindImportHeadTest(unittest.TestCase):
+    def test_ends_after_function_definition(self):
+        text = "import sys\nimport os\n\n\ndef main():\n    return 1\n"
+        self.assertEqual(head(text), "import sys\nimport os\n\n\ndef main():\n")
+
+    def test_ends_inside_try_block(self):
+        text = "import os\n\ntry:\n    import ujson as json\nexcept ImportError:\n"
+        text += "    import json\n\nx = 1\ny = 2\n"
+        self.assertEqual(head(text), text[: text.index("x = 1")] + "x = 1\n")
+
+    def test_ends_after_open_if_block(self):
+        text = (
+            "import os\n\nif os.name == 'nt':\n    sep = '\\\\'\nelse:\n    sep = '/'\n"
+        )
+        self.assertEqual(head(text), "import os\n\nif os.name == 'nt':\n")
+
+    def test_ends_after_class_definition(self):
+        text = "from a import b\n\n\nclass C(b):\n    pass\n"
+        self.assertEqual(head(text), "from a import b\n\n\nclass C(b):\n")
+
+    def test_keeps_comments_after_imports(self):
+        text = "import os\n\n# The answer.\nx = 42\ny = 1\n"
+        self.assertEqual(head(text), "import os\n\n# The answer.\nx = 42\n")
+
+    def test_covers_parenthesized_import(self):
+        text = "from a import (\n    b,\n    c,\n)\n\nx = 1\ny = 2\n"
+        self.assertEqual(head(text), "from a import (\n    b,\n    c,\n)\n\nx = 1\n")
+
+    def test_covers_nested_imports(self):
+        text = "import os\n\n\ndef f():\n    import re\n    return re\n\n\nx = 1\n"
+        self.assertEqual(
+            head(text), text[: text.index("    return")] + "    return re\n"
+        )
+
+    def test_whole_text_when_nothing_follows_imports(self):
+        self.assertIsNone(head("import sys\nimport os\n"))
+        self.assertIsNone(head("import os\n\nx = 1\n"))
+
+    def test_whole_text_without_imports(self):
+        self.assertIsNone(head("x = 1\ny = 2\n"))
+
+    def test_whole_text_when_file_is_skipped(self):
+        self.assertIsNone(
+            head("# isort: skip_file\nimport sys\nimport os\n\nx = 1\ny = 2\n")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()